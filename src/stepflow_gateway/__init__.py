@@ -5,15 +5,20 @@ StepFlow Gateway - 动态API网关
 动态API调用、认证管理和OAuth2回调流程。
 """
 
+import importlib
+
 __version__ = "1.0.0"
 __author__ = "StepFlow Team"
 __description__ = "Dynamic API Gateway for AI-driven platforms"
 
-from .core.gateway import StepFlowGateway
-from .core.config import GatewayConfig
-from .database.manager import DatabaseManager
-from .auth.manager import AuthManager
-from .api.manager import ApiManager
+# 按需导入导出的类（PEP 562），只使用子模块时无需加载整个网关
+_LAZY_IMPORTS = {
+    "StepFlowGateway": ".core.gateway",
+    "GatewayConfig": ".core.config",
+    "DatabaseManager": ".database.manager",
+    "AuthManager": ".auth.manager",
+    "ApiManager": ".api.manager",
+}
 
 __all__ = [
     "StepFlowGateway",
@@ -21,4 +26,18 @@ __all__ = [
     "DatabaseManager",
     "AuthManager",
     "ApiManager"
-] 
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_IMPORTS))
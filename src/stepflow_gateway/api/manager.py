@@ -2,36 +2,241 @@
 API 管理模块
 """
 
-import json
+import base64
 import logging
+import re
+import threading
 import time
 import uuid
-from datetime import datetime
-from typing import Dict, Any, List, Optional
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Set, Tuple
 from urllib.parse import urljoin, urlparse
 
-from ..database.manager import DatabaseManager
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..core.serialization import dumps as json_dumps, dumps_bytes as json_dumps_bytes, loads as json_loads
+from ..database.manager import DatabaseManager, new_log_id, _ENDPOINT_LIST_COLUMNS, _rows_to_dicts
 from ..auth.manager import AuthManager
 from .parser import OpenApiRefResolver, resolve_openapi_document, extract_endpoints_from_document
 
+_logger = logging.getLogger(__name__)
+
+
+# HTTP 连接池：缓存的目标主机数，以及每个主机保持的连接数
+# （与 Web 服务线程池的默认并发数一致，避免并发调用同一主机时连接被丢弃重建）
+_HTTP_POOL_CONNECTIONS = 16
+_HTTP_POOL_MAXSIZE = 40
+
+# 支持的 HTTP 方法 -> 是否携带请求体
+_HTTP_METHOD_SENDS_BODY = {
+    'GET': False,
+    'POST': True,
+    'PUT': True,
+    'DELETE': False,
+    'PATCH': True
+}
+
+# OpenAPI 文档必需的顶层字段（按校验顺序）
+_REQUIRED_OPENAPI_FIELDS = ('openapi', 'info', 'paths')
+_REQUIRED_OPENAPI_FIELD_SET = frozenset(_REQUIRED_OPENAPI_FIELDS)
+
+# 支持的 OpenAPI 主版本号
+_SUPPORTED_OPENAPI_MAJOR_VERSIONS = frozenset(('3',))
+
+def _apply_basic_auth(api_request: Dict[str, Any], auth_data: Dict[str, Any]):
+    """Basic Auth"""
+    username = auth_data.get('username', '')
+    password = auth_data.get('password', '')
+    if username and password:
+        credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+        api_request['headers']['Authorization'] = f"Basic {credentials}"
+
+
+def _apply_bearer_auth(api_request: Dict[str, Any], auth_data: Dict[str, Any]):
+    """Bearer Token"""
+    token = auth_data.get('token', '')
+    if token:
+        api_request['headers']['Authorization'] = f"Bearer {token}"
+
+
+def _set_api_key_header(api_request: Dict[str, Any], key_name: str, key_value: str):
+    """API Key 放在请求头"""
+    api_request['headers'][key_name] = key_value
+
+
+def _set_api_key_query(api_request: Dict[str, Any], key_name: str, key_value: str):
+    """API Key 放在查询参数"""
+    api_request['params'][key_name] = key_value
+
+
+def _set_api_key_cookie(api_request: Dict[str, Any], key_name: str, key_value: str):
+    """API Key 追加到 Cookie 头"""
+    headers = api_request['headers']
+    headers['Cookie'] = f"{headers.get('Cookie', '')}{key_name}={key_value}; "
+
+
+# API Key 位置（in）-> 设置函数，未知位置不处理
+_API_KEY_SETTERS = {
+    'header': _set_api_key_header,
+    'query': _set_api_key_query,
+    'cookie': _set_api_key_cookie
+}
+
+
+def _apply_api_key_auth(api_request: Dict[str, Any], auth_data: Dict[str, Any]):
+    """API Key"""
+    key_name = auth_data.get('name', '')
+    key_value = auth_data.get('value', '')
+    
+    if key_name and key_value:
+        setter = _API_KEY_SETTERS.get(auth_data.get('in', 'header'))
+        if setter is not None:
+            setter(api_request, key_name, key_value)
+
+
+def _apply_oauth2_auth(api_request: Dict[str, Any], auth_data: Dict[str, Any]):
+    """OAuth2 (简化处理，实际应该从缓存或数据库获取 token)"""
+    access_token = auth_data.get('access_token', '')
+    if access_token:
+        api_request['headers']['Authorization'] = f"Bearer {access_token}"
+
+
+# 认证类型 -> 请求认证处理函数
+_AUTH_APPLIERS = {
+    'basic': _apply_basic_auth,
+    'bearer': _apply_bearer_auth,
+    'api_key': _apply_api_key_auth,
+    'oauth2': _apply_oauth2_auth
+}
+
+_PATH_PARAM_PATTERN = re.compile(r'\{([^}]+)\}')
+
+
+class _RouteNode:
+    """路由树节点"""
+    __slots__ = ('literal', 'patterns', 'methods')
+    
+    def __init__(self):
+        self.literal: Dict[str, '_RouteNode'] = {}
+        self.patterns: List[Tuple[re.Pattern, '_RouteNode']] = []
+        self.methods: Dict[str, Tuple[int, Any]] = {}
+
+
+def _build_route_trie(rows) -> _RouteNode:
+    """按路径分段构建路由前缀树，叶子节点记录各方法对应的 (排序序号, 端点)"""
+    root = _RouteNode()
+    pattern_nodes: Dict[Tuple[int, str], _RouteNode] = {}
+    
+    for index, row in enumerate(rows):
+        node = root
+        for segment in row['path'].split('/'):
+            if '{' in segment:
+                # 含路径参数的段：每个参数匹配一个非空、不含 / 的片段
+                key = (id(node), segment)
+                child = pattern_nodes.get(key)
+                if child is None:
+                    child = pattern_nodes[key] = _RouteNode()
+                    regex = re.compile(_PATH_PARAM_PATTERN.sub('[^/]+', segment))
+                    node.patterns.append((regex, child))
+                node = child
+            else:
+                child = node.literal.get(segment)
+                if child is None:
+                    child = node.literal[segment] = _RouteNode()
+                node = child
+        node.methods.setdefault(row['method'], (index, row))
+    
+    return root
+
+
+def _match_route(node: _RouteNode, segments: List[str], position: int, method: str):
+    """在路由树中查找匹配的端点，多个匹配时返回排序最靠前的 (序号, 端点)"""
+    if position == len(segments):
+        return node.methods.get(method)
+    
+    segment = segments[position]
+    best = None
+    
+    child = node.literal.get(segment)
+    if child is not None:
+        best = _match_route(child, segments, position + 1, method)
+    
+    for regex, child in node.patterns:
+        if regex.fullmatch(segment):
+            found = _match_route(child, segments, position + 1, method)
+            if found is not None and (best is None or found[0] < best[0]):
+                best = found
+    
+    return best
+
+
+# 文档所属模板的 ID 与更新时间：二者不变时缓存的解析结果仍然有效，无需读取模板全文比较
+_OPENAPI_DOC_VERSION_SQL = '''
+    SELECT t.id, t.updated_at
+    FROM api_documents d
+    JOIN openapi_templates t ON d.template_id = t.id
+    WHERE d.id = ?
+'''
+
+
+class _FrozenDict(dict):
+    """只读字典：缓存的 OpenAPI 内容由多个调用方共享，禁止原地修改；复制（copy/deepcopy/pickle）得到普通字典"""
+    __slots__ = ()
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("缓存的 OpenAPI 内容是只读的，需要修改时请先复制")
+    
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+def _freeze_json(value: Any) -> Any:
+    """将解析后的 JSON 转为只读结构：对象转为 _FrozenDict，数组转为 tuple"""
+    if isinstance(value, dict):
+        return _FrozenDict((key, _freeze_json(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze_json(item) for item in value)
+    return value
+
 
 class ApiManager:
     """API管理器"""
     
-    def __init__(self, db_manager: DatabaseManager, auth_manager: AuthManager):
+    def __init__(self, db_manager: DatabaseManager, auth_manager: AuthManager, cache_ttl: float = 300):
         self.db_manager = db_manager
         self.auth_manager = auth_manager
-        self.logger = logging.getLogger(__name__)
         self.ref_resolver = OpenApiRefResolver()
+        # 以下端点模板、路由树、上游认证缓存都是进程内缓存，只在本实例的方法修改数据时立即失效；
+        # 多个 worker 进程或直接通过 db_manager 写库时无法感知，因此每隔 cache_ttl 秒整体清空一次，
+        # 其他进程的修改最多延迟 cache_ttl 秒生效（cache_ttl 为 0 时不缓存）
+        self._cache_ttl = cache_ttl
+        self._cache_expires_at = time.monotonic() + cache_ttl
+        # 端点请求模板缓存：endpoint_id -> 构建请求所需的静态字段
+        self._endpoint_template_cache: Dict[str, Dict[str, Any]] = {}
+        # 按 api_document_id 索引已缓存模板的端点 ID，删除文档时无需扫描整个缓存
+        self._endpoint_template_ids: Dict[str, Set[str]] = defaultdict(set)
+        # 路由树缓存：api_document_id（None 表示全部文档）-> (路由树, 按 (path, method) 的精确索引)
+        self._route_cache: Dict[Optional[str], Tuple[_RouteNode, Dict[Tuple[str, str], Any]]] = {}
+        # 上游请求认证：api_document_id -> (认证处理函数, 认证配置)，无可用配置时为 None；认证配置变更时失效
+        self._request_auth_cache: Dict[str, Optional[Tuple[Any, Dict[str, Any]]]] = {}
+        # 已解析的 OpenAPI 内容：api_document_id -> ((模板 ID, 模板更新时间), 只读的解析结果)
+        self._openapi_doc_cache: Dict[str, Tuple[Tuple[str, str], Optional[Dict[str, Any]]]] = {}
+        # 复用同一个 HTTP 会话（连接池保持长连接），首次调用时创建
+        self._http_session = None
+        self._http_session_lock = threading.Lock()
     
     # OpenAPI 文档解析和管理
     def register_api(self, name: str, openapi_content: str, version: str = None, base_url: str = None) -> Dict[str, Any]:
         """注册 OpenAPI 文档"""
         try:
             # 解析 OpenAPI 文档（处理 $ref 引用）
-            self.logger.info(f"开始解析 OpenAPI 文档: {name}")
+            _logger.info("开始解析 OpenAPI 文档: %s", name)
             resolved_doc = self.ref_resolver.resolve_document(openapi_content)
-            self.logger.info(f"OpenAPI 文档解析完成: {name}")
+            _logger.info("OpenAPI 文档解析完成: %s", name)
             
             # 验证 OpenAPI 格式
             self._validate_openapi(resolved_doc)
@@ -44,8 +249,9 @@ class ApiManager:
             
             # 提取并保存端点
             endpoints = self._extract_and_save_endpoints(resolved_doc, document_id)
+            self._route_cache.clear()
             
-            self.logger.info(f"API注册成功: {name} (ID: {document_id})")
+            _logger.info("API注册成功: %s (ID: %s)", name, document_id)
             
             return {
                 'success': True,
@@ -55,7 +261,7 @@ class ApiManager:
             }
             
         except Exception as e:
-            self.logger.error(f"API注册失败: {name} - {e}")
+            _logger.error("API注册失败: %s - %s", name, e)
             return {
                 'success': False,
                 'error': str(e)
@@ -63,24 +269,29 @@ class ApiManager:
     
     def _validate_openapi(self, doc: Dict[str, Any]):
         """验证 OpenAPI 文档格式"""
-        if 'openapi' not in doc:
-            raise ValueError("Missing 'openapi' field")
+        # 非对象文档（如 YAML 标量）先行排除，否则下面的 in 会退化为子串匹配
+        if not isinstance(doc, dict):
+            raise ValueError("OpenAPI document must be an object")
         
-        if 'info' not in doc:
-            raise ValueError("Missing 'info' field")
+        # 必需字段一次集合比较；缺失时再按校验顺序找出第一个缺失字段用于报错
+        if not doc.keys() >= _REQUIRED_OPENAPI_FIELD_SET:
+            missing = next(field for field in _REQUIRED_OPENAPI_FIELDS if field not in doc)
+            raise ValueError(f"Missing '{missing}' field")
         
-        if 'paths' not in doc:
-            raise ValueError("Missing 'paths' field")
-        
-        # 验证 OpenAPI 版本
-        openapi_version = doc['openapi']
-        if not openapi_version.startswith('3.'):
+        # 验证 OpenAPI 版本（YAML 中未加引号的 3.0 会被解析为数字，统一按字符串比较）
+        openapi_version = str(doc['openapi'])
+        major, dot, _ = openapi_version.partition('.')
+        if not dot or major not in _SUPPORTED_OPENAPI_MAJOR_VERSIONS:
             raise ValueError(f"Unsupported OpenAPI version: {openapi_version}")
+        
+        # paths 必须是对象，否则提取端点时才会报出难以理解的错误
+        if not isinstance(doc['paths'], dict):
+            raise ValueError("'paths' must be an object")
     
     def _save_template(self, name: str, openapi_content: str) -> str:
         """保存 OpenAPI 模板"""
-        template_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
+        template_id = uuid.uuid4().hex
+        now = self.db_manager.now_iso()
         
         with self.db_manager.get_cursor() as cursor:
             cursor.execute('''
@@ -93,8 +304,8 @@ class ApiManager:
     
     def _save_document(self, template_id: str, name: str, version: str, base_url: str, resolved_doc: Dict[str, Any]) -> str:
         """保存 API 文档"""
-        document_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
+        document_id = uuid.uuid4().hex
+        now = self.db_manager.now_iso()
         
         # 从解析后的文档中获取信息
         info = resolved_doc.get('info', {})
@@ -118,43 +329,20 @@ class ApiManager:
     def _extract_and_save_endpoints(self, resolved_doc: Dict[str, Any], document_id: str) -> List[Dict[str, Any]]:
         """提取并保存端点信息"""
         endpoints = self.ref_resolver.extract_endpoints(resolved_doc)
-        saved_endpoints = []
         
-        for endpoint in endpoints:
-            endpoint_id = str(uuid.uuid4())
-            now = datetime.now().isoformat()
-            
-            # 保存端点
-            with self.db_manager.get_cursor() as cursor:
-                cursor.execute('''
-                    INSERT INTO api_endpoints 
-                    (id, api_document_id, path, method, operation_id, summary, description, 
-                     tags, status, call_count, success_count, error_count, avg_response_time_ms, 
-                     created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    endpoint_id,
-                    document_id,
-                    endpoint['path'],
-                    endpoint['method'],
-                    endpoint['operation_id'],
-                    endpoint['summary'],
-                    endpoint['description'],
-                    json.dumps(endpoint['tags']) if endpoint['tags'] else None,
-                    'active',
-                    0, 0, 0, None,
-                    now, now
-                ))
-            
-            saved_endpoints.append({
+        # 一次性批量写入所有端点
+        endpoint_ids = self.db_manager.bulk_create_endpoints(document_id, endpoints)
+        
+        return [
+            {
                 'id': endpoint_id,
                 'path': endpoint['path'],
                 'method': endpoint['method'],
                 'operation_id': endpoint['operation_id'],
                 'summary': endpoint['summary']
-            })
-        
-        return saved_endpoints
+            }
+            for endpoint_id, endpoint in zip(endpoint_ids, endpoints)
+        ]
     
     def get_api(self, api_id: str) -> Optional[Dict[str, Any]]:
         """获取 API 信息"""
@@ -175,7 +363,8 @@ class ApiManager:
         """列出所有 API"""
         with self.db_manager.get_cursor() as cursor:
             cursor.execute('''
-                SELECT d.*, t.name as template_name
+                SELECT d.id, d.template_id, d.name, d.version, d.base_url, d.status,
+                       d.created_at, d.updated_at, t.name as template_name
                 FROM api_documents d
                 JOIN openapi_templates t ON d.template_id = t.id
                 WHERE d.status = ?
@@ -194,9 +383,15 @@ class ApiManager:
                 # 删除文档
                 cursor.execute('DELETE FROM api_documents WHERE id = ?', (api_id,))
                 
-                return cursor.rowcount > 0
+                deleted = cursor.rowcount > 0
+            
+            self._evict_endpoint_templates(api_id)
+            self._openapi_doc_cache.pop(api_id, None)
+            self._request_auth_cache.pop(api_id, None)
+            self._route_cache.clear()
+            return deleted
         except Exception as e:
-            self.logger.error(f"删除 API 失败: {api_id} - {e}")
+            _logger.error("删除 API 失败: %s - %s", api_id, e)
             return False
     
     def get_endpoint(self, endpoint_id: str) -> Optional[Dict[str, Any]]:
@@ -214,100 +409,163 @@ class ApiManager:
                 return dict(row)
             return None
     
-    def list_endpoints(self, api_document_id: str = None) -> List[Dict[str, Any]]:
-        """列出端点"""
+    def _expire_caches(self):
+        """缓存存在超过 cache_ttl 秒时清空端点模板、路由树和上游认证缓存"""
+        now = time.monotonic()
+        if now >= self._cache_expires_at:
+            self._endpoint_template_cache.clear()
+            self._endpoint_template_ids.clear()
+            self._route_cache.clear()
+            self._request_auth_cache.clear()
+            self._cache_expires_at = now + self._cache_ttl
+    
+    def _get_endpoint_template(self, endpoint_id: str) -> Optional[Dict[str, Any]]:
+        """获取端点请求模板（首次调用时构建并缓存）"""
+        self._expire_caches()
+        template = self._endpoint_template_cache.get(endpoint_id)
+        if template is None:
+            endpoint = self.get_endpoint(endpoint_id)
+            if not endpoint:
+                return None
+            # 端点查询已 JOIN 出文档的 base_url，无需再加载整个 API 文档
+            # 路径是否含 {参数} 在构建模板时判断一次，调用时无参数的路径直接跳过替换
+            template = {
+                'method': endpoint['method'],
+                'path': endpoint['path'],
+                'base_url': endpoint.get('base_url') or '',
+                'api_document_id': endpoint['api_document_id'],
+                'has_path_params': '{' in endpoint['path']
+            }
+            self._endpoint_template_cache[endpoint_id] = template
+            self._endpoint_template_ids[template['api_document_id']].add(endpoint_id)
+        return template
+    
+    def _evict_endpoint_templates(self, api_document_id: str):
+        """移除某个 API 文档下的端点请求模板缓存"""
+        for endpoint_id in self._endpoint_template_ids.pop(api_document_id, ()):
+            self._endpoint_template_cache.pop(endpoint_id, None)
+    
+    def list_endpoints(self, api_document_id: str = None, include_description: bool = False) -> List[Dict[str, Any]]:
+        """列出端点（只投影列表需要的列，description 需要时传 include_description=True）"""
+        columns = _ENDPOINT_LIST_COLUMNS + (", e.description" if include_description else "")
         with self.db_manager.get_cursor() as cursor:
             if api_document_id:
-                cursor.execute('''
-                    SELECT e.*, d.name as api_name, d.base_url
+                cursor.execute(f'''
+                    SELECT {columns}, d.name as api_name, d.base_url
                     FROM api_endpoints e
                     JOIN api_documents d ON e.api_document_id = d.id
                     WHERE e.api_document_id = ?
                     ORDER BY e.path, e.method
                 ''', (api_document_id,))
             else:
-                cursor.execute('''
-                    SELECT e.*, d.name as api_name, d.base_url
+                cursor.execute(f'''
+                    SELECT {columns}, d.name as api_name, d.base_url
                     FROM api_endpoints e
                     JOIN api_documents d ON e.api_document_id = d.id
                     ORDER BY e.path, e.method
                 ''')
             
-            endpoints = [dict(row) for row in cursor.fetchall()]
+            # 每行只构建一次字典，详细信息直接补充到该字典上，不再逐行复制
+            endpoints = _rows_to_dicts(cursor.fetchall())
             
-            # 为每个端点添加详细信息
-            detailed_endpoints = []
+            # 为每个端点添加详细信息（同一文档的 OpenAPI 内容只加载、解析一次，paths 也只取一次）
+            doc_paths: Dict[str, Optional[Dict[str, Any]]] = {}
             for endpoint in endpoints:
-                detailed_endpoint = dict(endpoint)
-                
-                # 解析 tags
-                try:
-                    tags = json.loads(endpoint.get('tags', '[]'))
-                    detailed_endpoint['tags'] = tags
-                except:
-                    detailed_endpoint['tags'] = []
+                # 解析 tags（多数端点没有 tags，空值不进入 try；只吞掉 JSON 解码错误）
+                raw_tags = endpoint.get('tags')
+                if raw_tags:
+                    try:
+                        endpoint['tags'] = json_loads(raw_tags)
+                    except (ValueError, TypeError):
+                        endpoint['tags'] = []
+                else:
+                    endpoint['tags'] = []
                 
                 # 从 OpenAPI 文档中获取参数和 security 信息
-                api_doc = self.get_api(endpoint['api_document_id'])
-                if api_doc and api_doc.get('openapi_content'):
+                paths = self._load_openapi_paths(endpoint['api_document_id'], doc_paths)
+                if paths is not None:
                     try:
-                        openapi_doc = json.loads(api_doc['openapi_content'])
-                        path_info = openapi_doc.get('paths', {}).get(endpoint['path'], {})
+                        path_info = paths.get(endpoint['path'], {})
                         operation_info = path_info.get(endpoint['method'].lower(), {})
                         
                         # 获取参数信息
                         parameters = operation_info.get('parameters', [])
-                        detailed_endpoint['parameters'] = parameters
+                        endpoint['parameters'] = parameters
                         
                         # 获取 security 信息
                         security = operation_info.get('security', [])
-                        detailed_endpoint['security'] = security
+                        endpoint['security'] = security
                         
                         # 获取 requestBody 信息
                         request_body = operation_info.get('requestBody', {})
-                        detailed_endpoint['request_body'] = request_body
+                        endpoint['request_body'] = request_body
                         
                         # 获取 responses 信息
                         responses = operation_info.get('responses', {})
-                        detailed_endpoint['responses'] = responses
+                        endpoint['responses'] = responses
                         
                     except Exception as e:
-                        self.logger.warning(f"解析端点详细信息失败: {endpoint['id']} - {e}")
-                        detailed_endpoint['parameters'] = []
-                        detailed_endpoint['security'] = []
-                        detailed_endpoint['request_body'] = {}
-                        detailed_endpoint['responses'] = {}
+                        _logger.warning("解析端点详细信息失败: %s - %s", endpoint['id'], e)
+                        endpoint['parameters'] = []
+                        endpoint['security'] = []
+                        endpoint['request_body'] = {}
+                        endpoint['responses'] = {}
                 else:
-                    detailed_endpoint['parameters'] = []
-                    detailed_endpoint['security'] = []
-                    detailed_endpoint['request_body'] = {}
-                    detailed_endpoint['responses'] = {}
-                
-                detailed_endpoints.append(detailed_endpoint)
+                    endpoint['parameters'] = []
+                    endpoint['security'] = []
+                    endpoint['request_body'] = {}
+                    endpoint['responses'] = {}
             
-            return detailed_endpoints
+            return endpoints
+    
+    def _load_openapi_paths(self, api_document_id: str, doc_paths: Dict[str, Optional[Dict[str, Any]]]):
+        """获取文档 OpenAPI 内容中的 paths，结果记入 doc_paths（无内容或解析失败记为 None）"""
+        if api_document_id in doc_paths:
+            return doc_paths[api_document_id]
+        
+        openapi_doc = self.get_openapi_doc(api_document_id)
+        paths = openapi_doc.get('paths', {}) if isinstance(openapi_doc, dict) else None
+        doc_paths[api_document_id] = paths
+        return paths
+    
+    def get_openapi_doc(self, api_document_id: str) -> Optional[Dict[str, Any]]:
+        """获取解析后的 OpenAPI 内容（只读，对象为只读字典、数组为 tuple，需要修改时先复制）；
+        模板 ID 与更新时间未变化时直接复用上次的解析结果，不读取模板全文"""
+        with self.db_manager.get_cursor() as cursor:
+            cursor.execute(_OPENAPI_DOC_VERSION_SQL, (api_document_id,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        
+        version = tuple(row)
+        cached = self._openapi_doc_cache.get(api_document_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        openapi_doc = None
+        openapi_content = self.db_manager.get_template_content(version[0])
+        if openapi_content:
+            try:
+                openapi_doc = _freeze_json(json_loads(openapi_content))
+            except ValueError as e:
+                _logger.warning("解析 OpenAPI 文档失败: %s - %s", api_document_id, e)
+        
+        self._openapi_doc_cache[api_document_id] = (version, openapi_doc)
+        return openapi_doc
     
     def call_api_by_path(self, path: str, method: str, request_data: Dict[str, Any], api_document_id: str = None) -> Dict[str, Any]:
         """通过路径调用 API"""
         try:
-            # 查找端点
-            endpoints = self.list_endpoints(api_document_id)
+            method = method.upper()
+            trie, exact_routes = self._get_routes(api_document_id)
             
-            # 匹配路径和方法
-            matched_endpoint = None
-            
-            # 首先尝试直接匹配（Flutter 端传递实际路径值，如 /pet/1）
-            for endpoint in endpoints:
-                if self._match_path(endpoint['path'], path) and endpoint['method'] == method.upper():
-                    matched_endpoint = endpoint
-                    break
+            # 首先尝试模式匹配（Flutter 端传递实际路径值，如 /pet/1）
+            found = _match_route(trie, path.split('/'), 0, method)
+            matched_endpoint = found[1] if found else None
             
             # 如果没有找到匹配，尝试匹配包含占位符的路径（Flutter 端传递 /pet/{petId}）
             if not matched_endpoint:
-                for endpoint in endpoints:
-                    if endpoint['path'] == path and endpoint['method'] == method.upper():
-                        matched_endpoint = endpoint
-                        break
+                matched_endpoint = exact_routes.get((path, method))
             
             if not matched_endpoint:
                 return {
@@ -319,32 +577,34 @@ class ApiManager:
             return self.call_api(matched_endpoint['id'], request_data)
             
         except Exception as e:
-            self.logger.error(f"通过路径调用 API 失败: {method} {path} - {e}")
+            _logger.error("通过路径调用 API 失败: %s %s - %s", method, path, e)
             return {
                 'success': False,
                 'error': str(e)
             }
     
-    def _match_path(self, pattern: str, actual: str) -> bool:
-        """匹配路径模式"""
-        # 简单的路径匹配，支持参数
-        # 例如: /users/{userId} 匹配 /users/123
-        import re
-        
-        # 将 OpenAPI 路径参数转换为正则表达式
-        regex_pattern = re.sub(r'\{[^}]+\}', r'[^/]+', pattern)
-        regex_pattern = f"^{regex_pattern}$"
-        
-        return re.match(regex_pattern, actual) is not None
+    def _get_routes(self, api_document_id: str = None):
+        """获取路由树（首次使用时由端点路由信息构建，API 注册或删除时失效）"""
+        self._expire_caches()
+        routes = self._route_cache.get(api_document_id)
+        if routes is None:
+            rows = self.db_manager.list_endpoint_rows(api_document_id)
+            exact_routes = {}
+            for row in rows:
+                exact_routes.setdefault((row['path'], row['method']), row)
+            routes = (_build_route_trie(rows), exact_routes)
+            self._route_cache[api_document_id] = routes
+        return routes
     
     # API 调用处理
     def call_api(self, endpoint_id: str, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """调用 API"""
-        start_time = time.time()
+        # 耗时用单调时钟计算，不受系统时间调整影响
+        start_time = time.monotonic()
         
         try:
-            # 获取端点信息
-            endpoint = self.get_endpoint(endpoint_id)
+            # 获取端点请求模板
+            endpoint = self._get_endpoint_template(endpoint_id)
             if not endpoint:
                 return {'success': False, 'error': 'Endpoint not found'}
             
@@ -355,7 +615,7 @@ class ApiManager:
             response = self.execute_api_call(api_request)
             
             # 计算响应时间
-            response_time_ms = int((time.time() - start_time) * 1000)
+            response_time_ms = int((time.monotonic() - start_time) * 1000)
             
             # 记录调用日志
             self.log_api_call(endpoint_id, api_request, response, response_time_ms)
@@ -367,34 +627,33 @@ class ApiManager:
             return response
             
         except Exception as e:
-            self.logger.error(f"API调用失败: {e}")
+            _logger.error("API调用失败: %s", e)
             return {'success': False, 'error': str(e)}
     
     def build_api_request(self, endpoint: Dict[str, Any], request_data: Dict[str, Any]) -> Dict[str, Any]:
         """构建 API 请求"""
-        # 获取 API 文档信息
-        api_doc = self.get_api(endpoint['api_document_id'])
-        
         # 路径参数替换
         path = endpoint['path']
-        params = dict(request_data.get('params', {})) if request_data.get('params') else {}
-        path_params = dict(request_data.get('path_params', {})) if request_data.get('path_params') else {}
+        # 每个字段只从 request_data 中取一次
+        params = request_data.get('params')
+        params = dict(params) if params else {}
+        path_params = request_data.get('path_params') or {}
         
-        import re
-        def replace_path_param(match):
-            key = match.group(1)
-            # 优先从 path_params 中获取，然后从 params 中获取
-            value = path_params.get(key) or params.get(key)
-            if value is not None:
-                # 替换后从 params 中移除（如果存在）
-                if key in params:
-                    params.pop(key)
-                return str(value)
-            return match.group(0)
-        path = re.sub(r'\{([^}]+)\}', replace_path_param, path)
+        if endpoint.get('has_path_params', True):
+            def replace_path_param(match):
+                key = match.group(1)
+                # 优先从 path_params 中获取，然后从 params 中获取
+                value = path_params.get(key) or params.get(key)
+                if value is not None:
+                    # 替换后从 params 中移除（如果存在）
+                    if key in params:
+                        params.pop(key)
+                    return str(value)
+                return match.group(0)
+            path = _PATH_PARAM_PATTERN.sub(replace_path_param, path)
         
         # 构建完整 URL
-        base_url = api_doc.get('base_url', '') if api_doc else ''
+        base_url = endpoint.get('base_url') or ''
         # 确保路径参数被正确替换后，再拼接 URL
         if base_url and path:
             # 如果 base_url 不以 / 结尾，且 path 以 / 开头，则直接拼接
@@ -405,11 +664,12 @@ class ApiManager:
         else:
             full_url = base_url + path if base_url and path else (base_url or path)
         
-        # 构建请求
+        # 构建请求（复制调用方的请求头，没有时直接新建，不再先分配一个空字典再复制）
+        headers = request_data.get('headers')
         api_request = {
             'method': endpoint['method'],
             'url': full_url,
-            'headers': request_data.get('headers', {}),
+            'headers': dict(headers) if headers else {},
             'body': request_data.get('body'),
             'params': params,
             'client_ip': request_data.get('client_ip'),
@@ -418,12 +678,14 @@ class ApiManager:
             'user_id': request_data.get('user_id')
         }
         
-        # 设置默认头
-        if 'Content-Type' not in api_request['headers']:
-            api_request['headers']['Content-Type'] = 'application/json'
+        # 设置默认头（请求头名大小写不敏感，键名只转小写一次）
+        request_headers = api_request['headers']
+        header_names = {name.lower() for name in request_headers}
+        if 'content-type' not in header_names:
+            request_headers['Content-Type'] = 'application/json'
         
-        if 'User-Agent' not in api_request['headers']:
-            api_request['headers']['User-Agent'] = 'StepFlow-Gateway/1.0.0'
+        if 'user-agent' not in header_names:
+            request_headers['User-Agent'] = 'StepFlow-Gateway/1.0.0'
         
         # 应用认证配置
         self._apply_auth_config(api_request, endpoint['api_document_id'])
@@ -433,90 +695,88 @@ class ApiManager:
     def _apply_auth_config(self, api_request: Dict[str, Any], api_document_id: str):
         """应用认证配置"""
         try:
-            # 获取该 API 文档的认证配置
-            auth_configs = self.list_auth_configs(api_document_id=api_document_id)
-            
-            for auth_config in auth_configs:
-                auth_type = auth_config.get('auth_type')
-                auth_data = json.loads(auth_config.get('auth_config', '{}'))
-                
-                if auth_type == 'basic':
-                    # Basic Auth
-                    username = auth_data.get('username', '')
-                    password = auth_data.get('password', '')
-                    if username and password:
-                        import base64
-                        credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
-                        api_request['headers']['Authorization'] = f"Basic {credentials}"
-                
-                elif auth_type == 'bearer':
-                    # Bearer Token
-                    token = auth_data.get('token', '')
-                    if token:
-                        api_request['headers']['Authorization'] = f"Bearer {token}"
-                
-                elif auth_type == 'api_key':
-                    # API Key
-                    key_in = auth_data.get('in', 'header')
-                    key_name = auth_data.get('name', '')
-                    key_value = auth_data.get('value', '')
-                    
-                    if key_name and key_value:
-                        if key_in == 'header':
-                            api_request['headers'][key_name] = key_value
-                        elif key_in == 'query':
-                            api_request['params'][key_name] = key_value
-                        elif key_in == 'cookie':
-                            # 处理 cookie
-                            if 'Cookie' not in api_request['headers']:
-                                api_request['headers']['Cookie'] = ''
-                            api_request['headers']['Cookie'] += f"{key_name}={key_value}; "
-                
-                elif auth_type == 'oauth2':
-                    # OAuth2 (简化处理，实际应该从缓存或数据库获取 token)
-                    access_token = auth_data.get('access_token', '')
-                    if access_token:
-                        api_request['headers']['Authorization'] = f"Bearer {access_token}"
-                
-                # 只应用第一个配置（按优先级排序）
-                break
+            request_auth = self._get_request_auth(api_document_id)
+            if request_auth is not None:
+                applier, auth_data = request_auth
+                applier(api_request, auth_data)
                 
         except Exception as e:
-            self.logger.warning(f"应用认证配置失败: {e}")
+            _logger.warning("应用认证配置失败: %s", e)
+    
+    def _get_request_auth(self, api_document_id: str) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """获取文档的上游请求认证处理函数及配置（首次调用时查询并缓存，避免每次调用都查询认证配置）"""
+        self._expire_caches()
+        if api_document_id in self._request_auth_cache:
+            return self._request_auth_cache[api_document_id]
+        
+        request_auth = None
+        for auth_config in self.list_auth_configs(api_document_id=api_document_id):
+            applier = _AUTH_APPLIERS.get(auth_config.get('auth_type'))
+            # list_auth_configs 已将 auth_config 解码为字典；配置为空时各认证方式都不会修改请求
+            auth_data = auth_config.get('auth_config')
+            if applier is not None and auth_data:
+                if isinstance(auth_data, str):
+                    auth_data = json_loads(auth_data)
+                request_auth = (applier, auth_data)
+            
+            # 只应用第一个配置（按优先级排序）
+            break
+        
+        self._request_auth_cache[api_document_id] = request_auth
+        return request_auth
+    
+    def _get_http_session(self):
+        """获取共享的 HTTP 会话"""
+        session = self._http_session
+        if session is None:
+            # 并发的首次调用只创建一个会话
+            with self._http_session_lock:
+                session = self._http_session
+                if session is None:
+                    session = requests.Session()
+                    # urllib3 默认已为连接设置 TCP_NODELAY，小请求不会被 Nagle 算法延迟，无需额外的 socket 选项
+                    adapter = HTTPAdapter(pool_connections=_HTTP_POOL_CONNECTIONS, pool_maxsize=_HTTP_POOL_MAXSIZE)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._http_session = session
+        return session
+    
+    def close(self):
+        """释放 HTTP 会话"""
+        if self._http_session is not None:
+            self._http_session.close()
+            self._http_session = None
     
     def execute_api_call(self, api_request: Dict[str, Any]) -> Dict[str, Any]:
         """执行 API 调用"""
-        import requests
-        
+        session = self._get_http_session()
         method = api_request['method']
         url = api_request['url']
         headers = api_request['headers']
         body = api_request['body']
         params = api_request.get('params', {})
+        sends_body = _HTTP_METHOD_SENDS_BODY.get(method)
+        if sends_body is None:
+            return {
+                'success': False,
+                'error': f'Unsupported HTTP method: {method}'
+            }
         
         try:
+            # 请求体直接序列化为 UTF-8 字节发送，省去 requests 内部的 json 编码与再次编码
+            # （默认 Content-Type 由 build_api_request 按大小写不敏感的方式设置，这里不再重复判断；
+            # 无法序列化的请求体与请求失败一样返回错误结果，不向调用方抛出异常）
+            data = json_dumps_bytes(body) if sends_body and body is not None else None
+            
             # 发送实际的 HTTP 请求
-            if method == 'GET':
-                response = requests.get(url, headers=headers, params=params, timeout=30)
-            elif method == 'POST':
-                response = requests.post(url, headers=headers, json=body, params=params, timeout=30)
-            elif method == 'PUT':
-                response = requests.put(url, headers=headers, json=body, params=params, timeout=30)
-            elif method == 'DELETE':
-                response = requests.delete(url, headers=headers, params=params, timeout=30)
-            elif method == 'PATCH':
-                response = requests.patch(url, headers=headers, json=body, params=params, timeout=30)
-            else:
-                return {
-                    'success': False,
-                    'error': f'Unsupported HTTP method: {method}'
-                }
+            response = session.request(method, url, headers=headers, data=data, params=params, timeout=30)
             
-            # 解析响应
+            # 解析响应：直接解码原始字节，跳过 response.json() 的文本解码与编码探测
+            content = response.content
             try:
-                response_body = response.json() if response.content else {}
-            except:
-                response_body = response.text if response.content else {}
+                response_body = json_loads(content) if content else {}
+            except ValueError:
+                response_body = response.text
             
             return {
                 'success': True,
@@ -527,14 +787,14 @@ class ApiManager:
             }
             
         except requests.exceptions.RequestException as e:
-            self.logger.error(f"HTTP请求失败: {e}")
+            _logger.error("HTTP请求失败: %s", e)
             return {
                 'success': False,
                 'error': f'HTTP request failed: {str(e)}',
                 'status_code': 0
             }
         except Exception as e:
-            self.logger.error(f"API调用异常: {e}")
+            _logger.error("API调用异常: %s", e)
             return {
                 'success': False,
                 'error': str(e),
@@ -544,39 +804,33 @@ class ApiManager:
     def log_api_call(self, endpoint_id: str, request: Dict[str, Any], 
                     response: Dict[str, Any], response_time_ms: int):
         """记录 API 调用日志"""
-        log_id = str(uuid.uuid4())
-        
-        with self.db_manager.get_cursor() as cursor:
-            cursor.execute('''
-                INSERT INTO api_call_logs 
-                (id, api_endpoint_id, request_method, request_url, request_headers, 
-                 request_body, request_params, response_status_code, response_headers, 
-                 response_body, response_time_ms, client_ip, user_agent, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                log_id,
-                endpoint_id,
-                request['method'],
-                request['url'],
-                json.dumps(request['headers']),
-                json.dumps(request['body']) if request['body'] else None,
-                json.dumps(request['params']),
-                response.get('status_code'),
-                json.dumps(response.get('headers', {})),
-                json.dumps(response.get('body', {})),
-                response_time_ms,
-                request.get('client_ip'),
-                request.get('user_agent'),
-                datetime.now().isoformat()
-            ))
+        # 请求头、请求体、响应等字段由日志写入线程序列化，不占用调用返回前的时间
+        self.db_manager.add_api_call_log((
+            new_log_id(),
+            endpoint_id,
+            request['method'],
+            request['url'],
+            request['headers'],
+            request['body'],
+            request['params'],
+            response.get('status_code'),
+            response.get('headers', {}),
+            response.get('body', {}),
+            response_time_ms,
+            request.get('client_ip'),
+            request.get('user_agent'),
+            self.db_manager.now_iso()
+        ))
     
     # 认证配置管理
     def add_auth_config(self, api_document_id: str, auth_type: str, auth_config: Dict[str, Any],
                        is_required: bool = True, is_global: bool = False, priority: int = 0) -> str:
         """添加认证配置"""
-        return self.db_manager.create_auth_config(
+        auth_config_id = self.db_manager.create_auth_config(
             api_document_id, auth_type, auth_config, is_required, is_global, priority
         )
+        self._request_auth_cache.pop(api_document_id, None)
+        return auth_config_id
     
     def get_auth_config(self, auth_config_id: str) -> Optional[Dict[str, Any]]:
         """获取认证配置"""
@@ -595,7 +849,7 @@ class ApiManager:
             
             if auth_config is not None:
                 updates.append("auth_config = ?")
-                params.append(json.dumps(auth_config))
+                params.append(json_dumps(auth_config))
             
             if is_required is not None:
                 updates.append("is_required = ?")
@@ -613,31 +867,38 @@ class ApiManager:
                 return False
             
             updates.append("updated_at = ?")
-            params.append(datetime.now().isoformat())
+            params.append(self.db_manager.now_iso())
             params.append(auth_config_id)
             
             cursor.execute(f'''
                 UPDATE api_auth_configs SET {', '.join(updates)} WHERE id = ?
             ''', params)
             
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+        
+        # 只知道配置 ID，直接清空缓存（认证配置变更很少）
+        self._request_auth_cache.clear()
+        return updated
     
     def delete_auth_config(self, auth_config_id: str) -> bool:
         """删除认证配置"""
         with self.db_manager.get_cursor() as cursor:
             cursor.execute('''
                 UPDATE api_auth_configs SET status = 'deleted', updated_at = ? WHERE id = ?
-            ''', (datetime.now().isoformat(), auth_config_id))
+            ''', (self.db_manager.now_iso(), auth_config_id))
             
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+        
+        self._request_auth_cache.clear()
+        return deleted
     
     # 资源引用管理
     def create_resource_reference(self, resource_type: str, resource_id: str, 
                                 api_endpoint_id: str, display_name: str = None,
                                 description: str = None, reference_config: Dict[str, Any] = None) -> str:
         """创建资源引用"""
-        ref_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
+        ref_id = uuid.uuid4().hex
+        now = self.db_manager.now_iso()
         
         with self.db_manager.get_cursor() as cursor:
             cursor.execute('''
@@ -650,7 +911,7 @@ class ApiManager:
                 resource_type,
                 resource_id,
                 api_endpoint_id,
-                json.dumps(reference_config) if reference_config else None,
+                json_dumps(reference_config) if reference_config else None,
                 display_name,
                 description,
                 'active',
@@ -658,7 +919,7 @@ class ApiManager:
                 now
             ))
         
-        self.logger.info(f"创建资源引用: {resource_type}:{resource_id} -> {api_endpoint_id}")
+        _logger.info("创建资源引用: %s:%s -> %s", resource_type, resource_id, api_endpoint_id)
         return ref_id
     
     def get_resource_references(self, resource_type: str = None, resource_id: str = None) -> List[Dict[str, Any]]:
@@ -683,7 +944,7 @@ class ApiManager:
             for row in cursor.fetchall():
                 result = dict(row)
                 if result.get('reference_config'):
-                    result['reference_config'] = json.loads(result['reference_config'])
+                    result['reference_config'] = json_loads(result['reference_config'])
                 results.append(result)
             
             return results
@@ -699,6 +960,7 @@ class ApiManager:
     
     def get_recent_api_calls(self, limit: int = 10) -> List[Dict[str, Any]]:
         """获取最近的 API 调用"""
+        self.db_manager.flush_api_call_logs()
         with self.db_manager.get_cursor() as cursor:
             cursor.execute('''
                 SELECT l.*, e.path, e.method, d.name as api_name
@@ -713,6 +975,7 @@ class ApiManager:
     
     def get_error_logs(self, limit: int = 10) -> List[Dict[str, Any]]:
         """获取错误日志"""
+        self.db_manager.flush_api_call_logs()
         with self.db_manager.get_cursor() as cursor:
             cursor.execute('''
                 SELECT l.*, e.path, e.method, d.name as api_name
@@ -743,8 +1006,9 @@ class ApiManager:
             # 检查端点状态
             active_endpoints = [ep for ep in endpoints if ep['status'] == 'active']
             
-            # 记录健康检查
-            check_id = str(uuid.uuid4())
+            # 记录健康检查（与调用日志一样是只追加的记录，使用计数器 ID，无需每次读取随机数）
+            check_id = new_log_id()
+            now = self.db_manager.now_iso()
             with self.db_manager.get_cursor() as cursor:
                 cursor.execute('''
                     INSERT INTO api_health_checks 
@@ -755,7 +1019,7 @@ class ApiManager:
                     api_document_id,
                     'endpoint_check',
                     'success' if active_endpoints else 'warning',
-                    json.dumps({
+                    json_dumps({
                         'total_endpoints': len(endpoints),
                         'active_endpoints': len(active_endpoints),
                         'endpoint_details': [
@@ -763,7 +1027,7 @@ class ApiManager:
                             for ep in endpoints
                         ]
                     }),
-                    datetime.now().isoformat()
+                    now
                 ))
             
             return {
@@ -771,9 +1035,9 @@ class ApiManager:
                 'api_name': api_doc['name'],
                 'total_endpoints': len(endpoints),
                 'active_endpoints': len(active_endpoints),
-                'check_time': datetime.now().isoformat()
+                'check_time': now
             }
             
         except Exception as e:
-            self.logger.error(f"API健康检查失败: {e}")
+            _logger.error("API健康检查失败: %s", e)
             return {'status': 'error', 'message': str(e)} 
\ No newline at end of file
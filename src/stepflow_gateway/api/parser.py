@@ -3,20 +3,70 @@ OpenAPI $ref 解析器
 处理 OpenAPI 文档中的 $ref 引用，展开为完整文档
 """
 
-import json
 import re
+import threading
+from itertools import islice
 from typing import Dict, Any, Optional, List
 from urllib.parse import urlparse
+
+import requests
 import yaml
+from requests.adapters import HTTPAdapter
+
+from ..core.serialization import loads as json_loads
+
+
+# path item 中表示操作的键（其余如 parameters、summary、servers 不是端点）-> 大写方法名
+_HTTP_METHODS = {
+    'get': 'GET',
+    'post': 'POST',
+    'put': 'PUT',
+    'delete': 'DELETE',
+    'patch': 'PATCH',
+    'head': 'HEAD',
+    'options': 'OPTIONS',
+    'trace': 'TRACE'
+}
+
+# 引用缓存未命中的哨兵（被引用的值本身可能为 None）
+_MISSING = object()
+
+# 拉取外部引用文档的超时时间（秒）及每个主机保持的连接数
+_EXTERNAL_REF_TIMEOUT = 10
+_EXTERNAL_REF_POOL_MAXSIZE = 16
+
+# 拉取外部引用文档共用的 HTTP 会话，首次使用时创建
+_external_ref_session = None
+_external_ref_session_lock = threading.Lock()
+
+
+def _get_external_ref_session():
+    """获取拉取外部引用文档共用的 HTTP 会话"""
+    global _external_ref_session
+    session = _external_ref_session
+    if session is None:
+        with _external_ref_session_lock:
+            session = _external_ref_session
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=_EXTERNAL_REF_POOL_MAXSIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _external_ref_session = session
+    return session
 
 
 class OpenApiRefResolver:
     """OpenAPI $ref 解析器"""
     
+    __slots__ = ('resolved_refs', 'external_docs', 'ref_stack', 'root_doc', 'component_index')
+    
     def __init__(self):
         self.resolved_refs = {}  # 缓存已解析的引用
         self.external_docs = {}  # 外部文档缓存
         self.ref_stack = []  # 引用栈，用于检测循环引用
+        self.root_doc = None  # 当前正在解析的根文档
+        self.component_index = None  # components 下各组件的扁平索引，首次使用时构建
     
     def resolve_document(self, openapi_content: str) -> Dict[str, Any]:
         """解析 OpenAPI 文档，处理所有 $ref 引用"""
@@ -24,14 +74,16 @@ class OpenApiRefResolver:
             # 重置状态
             self.resolved_refs = {}
             self.ref_stack = []
+            self.component_index = None
             
             # 解析文档
             if openapi_content.strip().startswith('{'):
-                doc = json.loads(openapi_content)
+                doc = json_loads(openapi_content)
             else:
                 doc = yaml.safe_load(openapi_content)
             
             # 解析所有引用
+            self.root_doc = doc
             resolved_doc = self._resolve_refs(doc, doc)
             
             return resolved_doc
@@ -41,20 +93,34 @@ class OpenApiRefResolver:
     
     def _resolve_refs(self, obj: Any, root_doc: Dict[str, Any], path: str = "") -> Any:
         """递归解析对象中的所有 $ref 引用"""
+        # path 为所在引用的位置，整个解析过程中沿用，不再为每个节点拼接子路径
         if isinstance(obj, dict):
             # 检查是否有 $ref
             if '$ref' in obj:
                 return self._resolve_ref(obj['$ref'], root_doc, path)
             
-            # 递归处理字典的所有值
-            resolved = {}
-            for key, value in obj.items():
-                resolved[key] = self._resolve_refs(value, root_doc, f"{path}.{key}" if path else key)
-            return resolved
+            # 递归处理字典的所有值；没有任何值变化时直接返回原对象，不做拷贝
+            resolved = None
+            for index, (key, value) in enumerate(obj.items()):
+                resolved_value = self._resolve_refs(value, root_doc, path)
+                if resolved is None:
+                    if resolved_value is value:
+                        continue
+                    resolved = dict(islice(obj.items(), index))
+                resolved[key] = resolved_value
+            return obj if resolved is None else resolved
             
         elif isinstance(obj, list):
-            # 递归处理列表的所有元素
-            return [self._resolve_refs(item, root_doc, f"{path}[{i}]") for i, item in enumerate(obj)]
+            # 递归处理列表的所有元素，同样只在有元素变化时才生成新列表
+            resolved = None
+            for index, item in enumerate(obj):
+                resolved_item = self._resolve_refs(item, root_doc, path)
+                if resolved is None:
+                    if resolved_item is item:
+                        continue
+                    resolved = obj[:index]
+                resolved.append(resolved_item)
+            return obj if resolved is None else resolved
         
         else:
             # 基本类型直接返回
@@ -62,15 +128,17 @@ class OpenApiRefResolver:
     
     def _resolve_ref(self, ref: str, root_doc: Dict[str, Any], current_path: str) -> Any:
         """解析单个 $ref 引用"""
+        # 先查缓存：同一目标被多处引用时只解析一次，命中时也省去引用栈的线性扫描
+        # （结果只在解析完成后写入缓存，因此已缓存的引用不可能还在引用栈中）
+        cached = self.resolved_refs.get(ref, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        
         # 检查循环引用
         if ref in self.ref_stack:
             # 检测到循环引用，返回引用本身而不是解析
             return {'$ref': ref, '_circular': True}
         
-        # 检查缓存
-        if ref in self.resolved_refs:
-            return self.resolved_refs[ref]
-        
         # 添加到引用栈
         self.ref_stack.append(ref)
         
@@ -94,26 +162,64 @@ class OpenApiRefResolver:
             # 从引用栈中移除
             self.ref_stack.pop()
     
-    def _resolve_internal_ref(self, ref: str, root_doc: Dict[str, Any]) -> Any:
-        """解析内部引用 (#/path/to/component)"""
-        try:
-            # 移除开头的 #
-            path = ref[1:]
-            
-            # 按 / 分割路径
-            parts = path.split('/')
+    def _build_component_index(self, root_doc: Dict[str, Any]) -> Dict[str, Any]:
+        """构建 #/components/<type>/<name> 到组件对象的扁平索引"""
+        index = {}
+        components = root_doc.get('components')
+        if isinstance(components, dict):
+            for component_type, items in components.items():
+                if isinstance(items, dict):
+                    for name, component in items.items():
+                        index[f"#/components/{component_type}/{name}"] = component
+        return index
+    
+    def _walk_pointer(self, root_doc: Any, path: str) -> Any:
+        """按 JSON Pointer 路径从根文档逐级导航（单次扫描，不构造中间列表）"""
+        current = root_doc
+        start = 0
+        length = len(path)
+        while start < length:
+            end = path.find('/', start)
+            if end == -1:
+                end = length
             
-            # 从根文档开始导航
-            current = root_doc
-            for part in parts:
-                if part:  # 跳过空字符串
+            if end > start:  # 跳过空段
+                part = path[start:end]
+                if '~' in part:
+                    part = part.replace('~1', '/').replace('~0', '~')
+                if isinstance(current, list):
+                    current = current[int(part)]
+                else:
                     current = current[part]
             
-            # 递归解析引用的内容
-            return self._resolve_refs(current, root_doc, path)
-            
-        except KeyError as e:
+            start = end + 1
+        return current
+    
+    def _resolve_internal_ref(self, ref: str, root_doc: Dict[str, Any]) -> Any:
+        """解析内部引用 (#/path/to/component)"""
+        # components 下的引用直接查索引，其余路径再逐级导航
+        if root_doc is self.root_doc:
+            if self.component_index is None:
+                self.component_index = self._build_component_index(root_doc)
+            current = self.component_index.get(ref)
+            if current is not None:
+                # 递归解析引用的内容
+                return self._resolve_refs(current, root_doc, ref[1:])
+        
+        # 移除开头的 #
+        return self._resolve_pointer(root_doc, ref[1:], ref)
+    
+    def _resolve_pointer(self, root_doc: Any, path: str, ref: str) -> Any:
+        """按 JSON Pointer 路径定位并解析引用内容（ref 仅用于错误信息）"""
+        # 缺失的键/下标（KeyError、IndexError）、非整数的数组下标（ValueError）、
+        # 在字符串等标量上继续导航（TypeError）都属于无效引用
+        try:
+            current = self._walk_pointer(root_doc, path)
+        except (ValueError, TypeError, IndexError, KeyError) as e:
             raise ValueError(f"Invalid internal reference '{ref}': {e}")
+        
+        # 递归解析引用的内容
+        return self._resolve_refs(current, root_doc, path)
     
     def _resolve_external_ref(self, ref: str) -> Any:
         """解析外部引用 (http://example.com/openapi.yaml#/components/schemas/User)"""
@@ -125,13 +231,13 @@ class OpenApiRefResolver:
             
             # 获取外部文档
             if base_url not in self.external_docs:
-                import requests
-                response = requests.get(base_url)
+                response = _get_external_ref_session().get(base_url, timeout=_EXTERNAL_REF_TIMEOUT)
                 response.raise_for_status()
                 
-                content = response.text
+                # 直接解析原始字节，不先解码成 str 再解析一遍
+                content = response.content
                 if base_url.endswith('.json'):
-                    external_doc = json.loads(content)
+                    external_doc = json_loads(content)
                 else:
                     external_doc = yaml.safe_load(content)
                 
@@ -141,7 +247,8 @@ class OpenApiRefResolver:
             
             # 解析片段引用
             if fragment:
-                return self._resolve_internal_ref(f"#{fragment}", external_doc)
+                # 外部文档不使用 components 索引，片段直接按指针导航，不再拼接 "#..." 引用
+                return self._resolve_pointer(external_doc, fragment, ref)
             else:
                 return external_doc
                 
@@ -156,31 +263,38 @@ class OpenApiRefResolver:
     
     def extract_endpoints(self, resolved_doc: Dict[str, Any]) -> List[Dict[str, Any]]:
         """从解析后的文档中提取端点信息"""
-        endpoints = []
-        
-        if 'paths' not in resolved_doc:
-            return endpoints
+        paths = resolved_doc.get('paths')
+        if not paths:
+            return []
         
-        for path, path_item in resolved_doc['paths'].items():
-            for method, operation in path_item.items():
-                if method in ['get', 'post', 'put', 'delete', 'patch', 'head', 'options', 'trace']:
-                    endpoint = {
-                        'path': path,
-                        'method': method.upper(),
-                        'operation_id': operation.get('operationId', ''),
-                        'summary': operation.get('summary', ''),
-                        'description': operation.get('description', ''),
-                        'tags': operation.get('tags', []),
-                        'parameters': self._extract_parameters(operation.get('parameters', [])),
-                        'request_body': self._extract_request_body(operation.get('requestBody')),
-                        'responses': self._extract_responses(operation.get('responses', {}))
-                    }
-                    endpoints.append(endpoint)
+        # 方法绑定到局部变量，避免循环内重复属性查找
+        extract_parameters = self._extract_parameters
+        extract_request_body = self._extract_request_body
+        extract_responses = self._extract_responses
         
-        return endpoints
+        return [
+            {
+                'path': path,
+                'method': http_method,
+                'operation_id': operation.get('operationId', ''),
+                'summary': operation.get('summary', ''),
+                'description': operation.get('description', ''),
+                'tags': operation.get('tags', []),
+                'parameters': extract_parameters(operation.get('parameters')),
+                'request_body': extract_request_body(operation.get('requestBody')),
+                'responses': extract_responses(operation.get('responses'))
+            }
+            for path, path_item in paths.items()
+            # 每个键只查一次方法表：非 HTTP 方法的键（parameters、summary 等）得到 None 被跳过
+            for method, operation in path_item.items()
+            if (http_method := _HTTP_METHODS.get(method)) is not None
+        ]
     
-    def _extract_parameters(self, parameters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _extract_parameters(self, parameters: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
         """提取参数信息"""
+        if not parameters:
+            return []
+        
         extracted = []
         for param in parameters:
             extracted_param = {
@@ -204,8 +318,11 @@ class OpenApiRefResolver:
             'content': request_body.get('content', {})
         }
     
-    def _extract_responses(self, responses: Dict[str, Any]) -> Dict[str, Any]:
+    def _extract_responses(self, responses: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         """提取响应信息"""
+        if not responses:
+            return {}
+        
         extracted = {}
         for status_code, response in responses.items():
             extracted[status_code] = {
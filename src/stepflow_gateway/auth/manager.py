@@ -2,7 +2,6 @@
 认证管理模块
 """
 
-import json
 import logging
 import secrets
 import hashlib
@@ -12,7 +11,17 @@ from typing import Dict, Any, Optional, List, Tuple
 import uuid
 
 from ..core.config import AuthConfig, OAuth2Config
-from ..database.manager import DatabaseManager
+from ..core.serialization import dumps as json_dumps, loads as json_loads
+from ..database.manager import DatabaseManager, new_log_id
+
+_logger = logging.getLogger(__name__)
+
+
+# Authorization 请求头的认证方案前缀，按前缀长度切片取出凭据
+_BASIC_AUTH_PREFIX = 'Basic '
+_BASIC_AUTH_PREFIX_LEN = len(_BASIC_AUTH_PREFIX)
+_BEARER_AUTH_PREFIX = 'Bearer '
+_BEARER_AUTH_PREFIX_LEN = len(_BEARER_AUTH_PREFIX)
 
 
 class AuthManager:
@@ -22,7 +31,13 @@ class AuthManager:
         self.db_manager = db_manager
         self.auth_config = auth_config
         self.oauth2_config = oauth2_config
-        self.logger = logging.getLogger(__name__)
+        # 认证类型 -> 执行方法
+        self._auth_executors = {
+            'basic': self.execute_basic_auth,
+            'bearer': self.execute_bearer_auth,
+            'api_key': self.execute_api_key_auth,
+            'oauth2': self.execute_oauth2_auth
+        }
     
     # 基础认证方法
     def authenticate_basic(self, username: str, password: str) -> Dict[str, Any]:
@@ -47,7 +62,7 @@ class AuthManager:
             }
             
         except Exception as e:
-            self.logger.error(f"Basic认证失败: {e}")
+            _logger.error("Basic认证失败: %s", e)
             return {'success': False, 'error': str(e)}
     
     def authenticate_bearer(self, token: str) -> Dict[str, Any]:
@@ -74,7 +89,7 @@ class AuthManager:
             }
             
         except Exception as e:
-            self.logger.error(f"Bearer认证失败: {e}")
+            _logger.error("Bearer认证失败: %s", e)
             return {'success': False, 'error': str(e)}
     
     def authenticate_api_key(self, api_key: str) -> Dict[str, Any]:
@@ -89,7 +104,7 @@ class AuthManager:
             }
             
         except Exception as e:
-            self.logger.error(f"API Key认证失败: {e}")
+            _logger.error("API Key认证失败: %s", e)
             return {'success': False, 'error': str(e)}
     
     # 密码管理
@@ -114,7 +129,7 @@ class AuthManager:
     # 会话管理
     def create_session(self, user_id: str, client_info: Dict[str, Any] = None) -> str:
         """创建会话"""
-        session_id = str(uuid.uuid4())
+        session_id = uuid.uuid4().hex
         session_token = self.generate_session_token(user_id)
         expires_at = datetime.now() + timedelta(minutes=self.auth_config.token_expire_minutes)
         
@@ -128,12 +143,12 @@ class AuthManager:
                 user_id,
                 session_token,
                 expires_at.isoformat(),
-                json.dumps(client_info) if client_info else None,
+                json_dumps(client_info) if client_info else None,
                 1,
-                datetime.now().isoformat()
+                self.db_manager.now_iso()
             ))
         
-        self.logger.info(f"创建会话: {session_id} for user: {user_id}")
+        _logger.info("创建会话: %s for user: %s", session_id, user_id)
         return session_token
     
     def get_session_by_token(self, session_token: str) -> Optional[Dict[str, Any]]:
@@ -148,7 +163,7 @@ class AuthManager:
             if row:
                 result = dict(row)
                 if result.get('client_info'):
-                    result['client_info'] = json.loads(result['client_info'])
+                    result['client_info'] = json_loads(result['client_info'])
                 return result
             return None
     
@@ -165,7 +180,7 @@ class AuthManager:
     def generate_session_token(self, user_id: str) -> str:
         """生成会话令牌"""
         # 简化的令牌生成，实际应该使用JWT
-        token_data = f"{user_id}:{datetime.now().isoformat()}:{secrets.token_hex(16)}"
+        token_data = f"{user_id}:{self.db_manager.now_iso()}:{secrets.token_hex(16)}"
         return base64.urlsafe_b64encode(token_data.encode()).decode()
     
     # API认证处理
@@ -190,7 +205,7 @@ class AuthManager:
             return {'success': False, 'error': 'All authentication methods failed'}
             
         except Exception as e:
-            self.logger.error(f"API认证处理失败: {e}")
+            _logger.error("API认证处理失败: %s", e)
             return {'success': False, 'error': str(e)}
     
     def execute_authentication(self, auth_config: Dict[str, Any], request_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -198,32 +213,27 @@ class AuthManager:
         auth_type = auth_config['auth_type']
         config = auth_config['auth_config']
         
+        executor = self._auth_executors.get(auth_type)
+        if executor is None:
+            return {'success': False, 'error': f'Unsupported auth type: {auth_type}'}
+        
         try:
-            if auth_type == 'basic':
-                return self.execute_basic_auth(config, request_data)
-            elif auth_type == 'bearer':
-                return self.execute_bearer_auth(config, request_data)
-            elif auth_type == 'api_key':
-                return self.execute_api_key_auth(config, request_data)
-            elif auth_type == 'oauth2':
-                return self.execute_oauth2_auth(config, request_data)
-            else:
-                return {'success': False, 'error': f'Unsupported auth type: {auth_type}'}
-                
+            return executor(config, request_data)
+            
         except Exception as e:
-            self.logger.error(f"执行认证失败: {auth_type} - {e}")
+            _logger.error("执行认证失败: %s - %s", auth_type, e)
             return {'success': False, 'error': str(e)}
     
     def execute_basic_auth(self, config: Dict[str, Any], request_data: Dict[str, Any]) -> Dict[str, Any]:
         """执行Basic认证"""
         # 从请求头获取认证信息
         auth_header = request_data.get('headers', {}).get('Authorization', '')
-        if not auth_header.startswith('Basic '):
+        if not auth_header.startswith(_BASIC_AUTH_PREFIX):
             return {'success': False, 'error': 'Missing Basic auth header'}
         
         # 解析用户名密码
         try:
-            credentials = base64.b64decode(auth_header[6:]).decode()
+            credentials = base64.b64decode(auth_header[_BASIC_AUTH_PREFIX_LEN:]).decode()
             username, password = credentials.split(':', 1)
         except Exception:
             return {'success': False, 'error': 'Invalid Basic auth format'}
@@ -246,10 +256,10 @@ class AuthManager:
         """执行Bearer认证"""
         # 从请求头获取token
         auth_header = request_data.get('headers', {}).get('Authorization', '')
-        if not auth_header.startswith('Bearer '):
+        if not auth_header.startswith(_BEARER_AUTH_PREFIX):
             return {'success': False, 'error': 'Missing Bearer token'}
         
-        token = auth_header[7:]
+        token = auth_header[_BEARER_AUTH_PREFIX_LEN:]
         
         # 验证token
         auth_result = self.authenticate_bearer(token)
@@ -319,7 +329,7 @@ class AuthManager:
     # OAuth2 支持
     def create_oauth2_auth_state(self, user_id: str, api_document_id: str, auth_config: Dict[str, Any]) -> Dict[str, Any]:
         """创建OAuth2授权状态"""
-        state_id = str(uuid.uuid4())
+        state_id = uuid.uuid4().hex
         state = secrets.token_urlsafe(16)
         
         # 生成PKCE参数
@@ -350,7 +360,7 @@ class AuthManager:
                 'code',
                 auth_config['auth_config']['client_id'],
                 expires_at.isoformat(),
-                datetime.now().isoformat()
+                self.db_manager.now_iso()
             ))
         
         return {
@@ -401,7 +411,7 @@ class AuthManager:
                 return token_response
                 
         except Exception as e:
-            self.logger.error(f"OAuth2回调处理失败: {e}")
+            _logger.error("OAuth2回调处理失败: %s", e)
             return {'success': False, 'error': str(e)}
     
     def get_oauth2_auth_state(self, state_id: str) -> Optional[Dict[str, Any]]:
@@ -430,8 +440,11 @@ class AuthManager:
     
     def save_user_authorization(self, user_id: str, api_document_id: str, token_response: Dict[str, Any]) -> Dict[str, Any]:
         """保存用户授权"""
-        auth_session_id = str(uuid.uuid4())
-        expires_at = datetime.now() + timedelta(seconds=token_response['expires_in'])
+        auth_session_id = uuid.uuid4().hex
+        # 时间戳只格式化一次，created_at 与 updated_at 共用同一个字符串
+        now = datetime.now()
+        now_iso = now.isoformat()
+        expires_at = (now + timedelta(seconds=token_response['expires_in'])).isoformat()
         
         with self.db_manager.get_cursor() as cursor:
             cursor.execute('''
@@ -447,19 +460,19 @@ class AuthManager:
                 token_response['access_token'],
                 token_response['refresh_token'],
                 token_response['token_type'],
-                expires_at.isoformat(),
+                expires_at,
                 token_response['scope'],
                 token_response['auth_id'],
                 token_response['provider_user_id'],
                 1,
-                datetime.now().isoformat(),
-                datetime.now().isoformat()
+                now_iso,
+                now_iso
             ))
         
         return {
             'id': auth_session_id,
             'auth_id': token_response['auth_id'],
-            'expires_at': expires_at.isoformat()
+            'expires_at': expires_at
         }
     
     def get_user_authorization(self, user_id: str, api_document_id: str) -> Optional[Dict[str, Any]]:
@@ -477,31 +490,23 @@ class AuthManager:
     def log_auth_attempt(self, auth_config_id: str, auth_type: str, auth_status: str, 
                         auth_method: str, response_time_ms: int, client_ip: str = None, 
                         error_message: str = None):
-        """记录认证尝试"""
-        log_id = str(uuid.uuid4())
-        
-        with self.db_manager.get_cursor() as cursor:
-            cursor.execute('''
-                INSERT INTO auth_logs 
-                (id, auth_config_id, auth_type, auth_status, auth_method, response_time_ms, 
-                 client_ip, error_message, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                log_id,
-                auth_config_id,
-                auth_type,
-                auth_status,
-                auth_method,
-                response_time_ms,
-                client_ip,
-                error_message,
-                datetime.now().isoformat()
-            ))
+        """记录认证尝试（缓冲后批量写入）"""
+        self.db_manager.add_auth_log((
+            new_log_id(),
+            auth_config_id,
+            auth_type,
+            auth_status,
+            auth_method,
+            response_time_ms,
+            client_ip,
+            error_message,
+            self.db_manager.now_iso()
+        ))
     
     def log_oauth2_callback(self, auth_state_id: str, user_id: str, callback_code: str, 
                            callback_state: str, token_response: Dict[str, Any]):
         """记录OAuth2回调"""
-        log_id = str(uuid.uuid4())
+        log_id = new_log_id()
         
         with self.db_manager.get_cursor() as cursor:
             cursor.execute('''
@@ -515,11 +520,11 @@ class AuthManager:
                 user_id,
                 callback_code,
                 callback_state,
-                json.dumps(token_response),
+                json_dumps(token_response),
                 token_response['auth_id'],
                 token_response['provider_user_id'],
                 '192.168.1.102',  # 实际应该从请求获取
                 'success',
                 250,
-                datetime.now().isoformat()
+                self.db_manager.now_iso()
             )) 
\ No newline at end of file
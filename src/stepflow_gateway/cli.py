@@ -10,6 +10,7 @@ from typing import Dict, Any
 
 from .core.gateway import StepFlowGateway
 from .core.config import GatewayConfig
+from .core.serialization import loads as json_loads
 
 
 def main():
@@ -91,22 +92,7 @@ def main():
     
     # 创建 Gateway 实例
     with StepFlowGateway(config) as gateway:
-        if args.command == 'init':
-            handle_init(gateway, args)
-        elif args.command == 'register':
-            handle_register(gateway, args)
-        elif args.command == 'list':
-            handle_list(gateway, args)
-        elif args.command == 'call':
-            handle_call(gateway, args)
-        elif args.command == 'auth':
-            handle_auth(gateway, args)
-        elif args.command == 'user':
-            handle_user(gateway, args)
-        elif args.command == 'stats':
-            handle_stats(gateway, args)
-        elif args.command == 'health':
-            handle_health(gateway, args)
+        _COMMAND_HANDLERS[args.command](gateway, args)
 
 
 def load_config(args) -> GatewayConfig:
@@ -198,21 +184,21 @@ def handle_call(gateway: StepFlowGateway, args):
     
     if args.headers:
         try:
-            request_data['headers'] = json.loads(args.headers)
+            request_data['headers'] = json_loads(args.headers)
         except json.JSONDecodeError:
             print("❌ 请求头格式错误")
             sys.exit(1)
     
     if args.body:
         try:
-            request_data['body'] = json.loads(args.body)
+            request_data['body'] = json_loads(args.body)
         except json.JSONDecodeError:
             print("❌ 请求体格式错误")
             sys.exit(1)
     
     if args.params:
         try:
-            request_data['params'] = json.loads(args.params)
+            request_data['params'] = json_loads(args.params)
         except json.JSONDecodeError:
             print("❌ 查询参数格式错误")
             sys.exit(1)
@@ -240,8 +226,8 @@ def handle_auth(gateway: StepFlowGateway, args):
         
         # 读取认证配置
         try:
-            with open(args.config_file, 'r', encoding='utf-8') as f:
-                auth_config = json.load(f)
+            with open(args.config_file, 'rb') as f:
+                auth_config = json_loads(f.read())
         except Exception as e:
             print(f"❌ 读取认证配置文件失败: {e}")
             sys.exit(1)
@@ -359,5 +345,18 @@ def handle_health(gateway: StepFlowGateway, args):
     print(f"  检查时间: {result.get('check_time', 'N/A')}")
 
 
+# 子命令 -> 处理函数
+_COMMAND_HANDLERS = {
+    'init': handle_init,
+    'register': handle_register,
+    'list': handle_list,
+    'call': handle_call,
+    'auth': handle_auth,
+    'user': handle_user,
+    'stats': handle_stats,
+    'health': handle_health
+}
+
+
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -8,6 +8,8 @@ from pathlib import Path
 from typing import Dict, Any, Optional
 from dataclasses import dataclass, field
 
+from .serialization import loads as json_loads
+
 
 @dataclass
 class DatabaseConfig:
@@ -16,6 +18,11 @@ class DatabaseConfig:
     timeout: int = 30
     check_same_thread: bool = False
     isolation_level: Optional[str] = None
+    cached_statements: int = 256
+    call_log_batch_size: int = 32
+    auth_log_batch_size: int = 32
+    log_queue_max_batches: int = 64
+    log_flush_interval: float = 1.0
 
 
 @dataclass
@@ -81,8 +88,9 @@ class GatewayConfig:
         if not config_file.exists():
             return cls()
         
-        with open(config_file, 'r', encoding='utf-8') as f:
-            config_data = json.load(f)
+        # 以二进制读取后直接解析，省去文本解码这一步
+        with open(config_file, 'rb') as f:
+            config_data = json_loads(f.read())
         
         return cls.from_dict(config_data)
     
@@ -123,7 +131,12 @@ class GatewayConfig:
                 'path': self.database.path,
                 'timeout': self.database.timeout,
                 'check_same_thread': self.database.check_same_thread,
-                'isolation_level': self.database.isolation_level
+                'isolation_level': self.database.isolation_level,
+                'cached_statements': self.database.cached_statements,
+                'call_log_batch_size': self.database.call_log_batch_size,
+                'auth_log_batch_size': self.database.auth_log_batch_size,
+                'log_queue_max_batches': self.database.log_queue_max_batches,
+                'log_flush_interval': self.database.log_flush_interval
             },
             'auth': {
                 'secret_key': self.auth.secret_key,
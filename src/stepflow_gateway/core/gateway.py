@@ -2,6 +2,7 @@
 StepFlow Gateway 主类
 """
 
+import functools
 import logging
 import time
 from typing import Dict, Any, Optional, List
@@ -13,6 +14,20 @@ from ..auth.manager import AuthManager
 from ..api.manager import ApiManager
 
 
+def _error_result(message: str):
+    """装饰器：方法抛出异常时记录错误日志，并返回 {'success': False, 'error': ...}"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return func(self, *args, **kwargs)
+            except Exception as e:
+                self.logger.error("%s: %s", message, e)
+                return {'success': False, 'error': str(e)}
+        return wrapper
+    return decorator
+
+
 class StepFlowGateway:
     """StepFlow Gateway 主类"""
     
@@ -23,7 +38,10 @@ class StepFlowGateway:
         # 初始化组件
         self.db_manager = DatabaseManager(self.config.database)
         self.auth_manager = AuthManager(self.db_manager, self.config.auth, self.config.oauth2)
-        self.api_manager = ApiManager(self.db_manager, self.auth_manager)
+        self.api_manager = ApiManager(
+            self.db_manager, self.auth_manager,
+            cache_ttl=self.config.cache_ttl if self.config.cache_enabled else 0
+        )
         
         self.logger.info("StepFlow Gateway 初始化完成")
     
@@ -107,22 +125,18 @@ class StepFlowGateway:
             self.logger.warning(f"创建默认用户失败: {e}")
     
     # OpenAPI 文档管理
+    @_error_result("API注册异常")
     def register_api(self, name: str, openapi_content: str, version: str = None, 
                     base_url: str = None) -> Dict[str, Any]:
         """注册 API"""
-        try:
-            result = self.api_manager.register_api(name, openapi_content, version, base_url)
-            
-            if result['success']:
-                self.logger.info(f"API注册成功: {name} (ID: {result['document_id']})")
-            else:
-                self.logger.error(f"API注册失败: {result['error']}")
-            
-            return result
-            
-        except Exception as e:
-            self.logger.error(f"API注册异常: {e}")
-            return {'success': False, 'error': str(e)}
+        result = self.api_manager.register_api(name, openapi_content, version, base_url)
+        
+        if result['success']:
+            self.logger.info(f"API注册成功: {name} (ID: {result['document_id']})")
+        else:
+            self.logger.error(f"API注册失败: {result['error']}")
+        
+        return result
     
     def get_api(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """获取 API 信息"""
@@ -146,9 +160,9 @@ class StepFlowGateway:
         """获取端点信息"""
         return self.api_manager.get_endpoint(endpoint_id)
     
-    def list_endpoints(self, api_document_id: str = None) -> List[Dict[str, Any]]:
+    def list_endpoints(self, api_document_id: str = None, include_description: bool = False) -> List[Dict[str, Any]]:
         """列出端点"""
-        return self.api_manager.list_endpoints(api_document_id)
+        return self.api_manager.list_endpoints(api_document_id, include_description)
     
     def find_endpoint(self, path: str, method: str, api_document_id: str = None) -> Optional[Dict[str, Any]]:
         """查找端点"""
@@ -160,34 +174,26 @@ class StepFlowGateway:
         return None
     
     # API 调用
+    @_error_result("API调用异常")
     def call_api(self, endpoint_id: str, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """调用 API"""
-        try:
-            start_time = time.time()
-            
-            # 调用 API
-            result = self.api_manager.call_api(endpoint_id, request_data)
-            
-            # 记录调用时间
-            call_time = time.time() - start_time
-            self.logger.info(f"API调用完成: {endpoint_id}, 耗时: {call_time:.3f}s")
-            
-            return result
-            
-        except Exception as e:
-            self.logger.error(f"API调用异常: {e}")
-            return {'success': False, 'error': str(e)}
+        start_time = time.monotonic()
+        
+        # 调用 API
+        result = self.api_manager.call_api(endpoint_id, request_data)
+        
+        # 记录调用时间
+        call_time = time.monotonic() - start_time
+        self.logger.info("API调用完成: %s, 耗时: %.3fs", endpoint_id, call_time)
+        
+        return result
     
+    @_error_result("通过路径调用API异常")
     def call_api_by_path(self, path: str, method: str, request_data: Dict[str, Any], 
                         api_document_id: str = None) -> Dict[str, Any]:
         """通过路径调用 API"""
-        try:
-            # 直接使用 ApiManager 的 call_api_by_path 方法
-            return self.api_manager.call_api_by_path(path, method, request_data, api_document_id)
-            
-        except Exception as e:
-            self.logger.error(f"通过路径调用API异常: {e}")
-            return {'success': False, 'error': str(e)}
+        # 直接使用 ApiManager 的 call_api_by_path 方法
+        return self.api_manager.call_api_by_path(path, method, request_data, api_document_id)
     
     # 认证管理
     def add_auth_config(self, api_document_id: str, auth_type: str, auth_config: Dict[str, Any],
@@ -250,44 +256,40 @@ class StepFlowGateway:
         return self.db_manager.list_users(role, is_active)
     
     # OAuth2 支持
+    @_error_result("创建OAuth2认证URL失败")
     def create_oauth2_auth_url(self, user_id: str, api_document_id: str) -> Dict[str, Any]:
         """创建 OAuth2 认证 URL"""
-        try:
-            # 获取 OAuth2 认证配置
-            auth_configs = self.api_manager.list_auth_configs(api_document_id, 'oauth2')
-            if not auth_configs:
-                return {'success': False, 'error': 'No OAuth2 configuration found'}
-            
-            auth_config = auth_configs[0]  # 使用第一个 OAuth2 配置
-            
-            # 创建授权状态
-            auth_state = self.auth_manager.create_oauth2_auth_state(user_id, api_document_id, auth_config)
-            
-            # 生成认证 URL
-            config = auth_config['auth_config']
-            params = {
-                'response_type': 'code',
-                'client_id': config['client_id'],
-                'redirect_uri': config['redirect_uri'],
-                'scope': config.get('scope', 'read'),
-                'state': auth_state['state'],
-                'code_challenge': auth_state['code_challenge'],
-                'code_challenge_method': 'S256'
-            }
-            
-            query_string = '&'.join([f"{k}={v}" for k, v in params.items()])
-            auth_url = f"{config['auth_url']}?{query_string}"
-            
-            return {
-                'success': True,
-                'auth_url': auth_url,
-                'state_id': auth_state['id'],
-                'state': auth_state['state']
-            }
-            
-        except Exception as e:
-            self.logger.error(f"创建OAuth2认证URL失败: {e}")
-            return {'success': False, 'error': str(e)}
+        # 获取 OAuth2 认证配置
+        auth_configs = self.api_manager.list_auth_configs(api_document_id, 'oauth2')
+        if not auth_configs:
+            return {'success': False, 'error': 'No OAuth2 configuration found'}
+        
+        auth_config = auth_configs[0]  # 使用第一个 OAuth2 配置
+        
+        # 创建授权状态
+        auth_state = self.auth_manager.create_oauth2_auth_state(user_id, api_document_id, auth_config)
+        
+        # 生成认证 URL
+        config = auth_config['auth_config']
+        params = {
+            'response_type': 'code',
+            'client_id': config['client_id'],
+            'redirect_uri': config['redirect_uri'],
+            'scope': config.get('scope', 'read'),
+            'state': auth_state['state'],
+            'code_challenge': auth_state['code_challenge'],
+            'code_challenge_method': 'S256'
+        }
+        
+        query_string = '&'.join([f"{k}={v}" for k, v in params.items()])
+        auth_url = f"{config['auth_url']}?{query_string}"
+        
+        return {
+            'success': True,
+            'auth_url': auth_url,
+            'state_id': auth_state['id'],
+            'state': auth_state['state']
+        }
     
     def handle_oauth2_callback(self, auth_state_id: str, callback_code: str, callback_state: str) -> Dict[str, Any]:
         """处理 OAuth2 回调"""
@@ -354,11 +356,13 @@ class StepFlowGateway:
     
     def close(self):
         """关闭 Gateway"""
-        try:
-            self.db_manager.close()
-            self.logger.info("StepFlow Gateway 已关闭")
-        except Exception as e:
-            self.logger.error(f"关闭Gateway时出错: {e}")
+        # 各组件互不依赖，逐个关闭，某个组件出错不影响其余组件释放资源
+        for component in (self.api_manager, self.db_manager):
+            try:
+                component.close()
+            except Exception as e:
+                self.logger.error(f"关闭Gateway时出错: {e}")
+        self.logger.info("StepFlow Gateway 已关闭")
     
     def __enter__(self):
         """上下文管理器入口"""
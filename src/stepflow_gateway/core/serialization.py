@@ -0,0 +1,44 @@
+"""
+JSON 序列化模块
+
+优先使用 orjson（如已安装），否则回退到标准库 json
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+
+if orjson is not None:
+    # 与 json.dumps 保持一致：允许非字符串键
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """序列化为 UTF-8 字节"""
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # orjson 不支持的类型（如超大整数）交给标准库处理
+            return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    def dumps(obj: Any) -> str:
+        """序列化为字符串"""
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(data: Union[str, bytes, bytearray]) -> Any:
+        """反序列化 JSON 字符串或字节"""
+        return orjson.loads(data)
+else:
+    def dumps_bytes(obj: Any) -> bytes:
+        """序列化为 UTF-8 字节"""
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    def dumps(obj: Any) -> str:
+        """序列化为字符串"""
+        return json.dumps(obj)
+
+    loads = json.loads
@@ -3,15 +3,212 @@
 """
 
 import sqlite3
-import json
 import logging
+import os
+import queue
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Iterator, Iterable
 from contextlib import contextmanager
 from datetime import datetime
+from functools import lru_cache
 import uuid
+from itertools import repeat, chain
+import itertools
 
 from ..core.config import DatabaseConfig
+from ..core.serialization import dumps as json_dumps, loads as json_loads
+
+_logger = logging.getLogger(__name__)
+
+
+# 列表查询只投影需要的列，大字段（模板 content、端点 description）按需读取
+_TEMPLATE_LIST_COLUMNS = "id, name, status, created_at, updated_at"
+
+_DOCUMENT_COLUMNS = "d.id, d.template_id, d.name, d.version, d.base_url, d.status, d.created_at, d.updated_at"
+
+_ENDPOINT_LIST_COLUMNS = (
+    "e.id, e.api_document_id, e.path, e.method, e.operation_id, e.summary, e.tags, e.status, "
+    "e.call_count, e.success_count, e.error_count, e.avg_response_time_ms, e.created_at, e.updated_at"
+)
+
+# 热点语句的 SQL 常量：固定文本可直接命中 sqlite3 的语句缓存，避免重复 prepare
+_GET_TEMPLATE_SQL = f'SELECT {_TEMPLATE_LIST_COLUMNS}, content FROM openapi_templates WHERE id = ?'
+
+_GET_ENDPOINT_SQL = f'''
+    SELECT {_ENDPOINT_LIST_COLUMNS}, e.description, d.name as api_name, d.base_url
+    FROM api_endpoints e
+    JOIN api_documents d ON e.api_document_id = d.id
+    WHERE e.id = ?
+'''
+
+_INSERT_ENDPOINT_SQL = '''
+    INSERT INTO api_endpoints 
+    (id, api_document_id, path, method, operation_id, summary, description, tags, status, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'active', ?, ?)
+'''
+
+# update_template 的语句按字段掩码预先生成：bit0 = name，bit1 = content
+_UPDATE_TEMPLATE_SQL = {
+    0b01: 'UPDATE openapi_templates SET name = ?, updated_at = ? WHERE id = ? AND (name IS NOT ?)',
+    0b10: 'UPDATE openapi_templates SET content = ?, updated_at = ? WHERE id = ? AND (content IS NOT ?)',
+    0b11: (
+        'UPDATE openapi_templates SET name = ?, content = ?, updated_at = ? '
+        'WHERE id = ? AND (name IS NOT ? OR content IS NOT ?)'
+    ),
+}
+
+_ENDPOINT_INSERT_COLUMNS = ('id', 'api_document_id', 'path', 'method', 'operation_id', 'summary',
+                            'description', 'tags', 'status', 'created_at', 'updated_at')
+
+_INSERT_API_CALL_LOG_SQL = '''
+    INSERT INTO api_call_logs 
+    (id, api_endpoint_id, request_method, request_url, request_headers, 
+     request_body, request_params, response_status_code, response_headers, 
+     response_body, response_time_ms, client_ip, user_agent, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_INSERT_AUTH_LOG_SQL = '''
+    INSERT INTO auth_logs 
+    (id, auth_config_id, auth_type, auth_status, auth_method, response_time_ms, 
+     client_ip, error_message, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# 调用日志中空对象的序列化结果（查询参数、响应体通常为空，无需每次序列化）
+_EMPTY_JSON_OBJECT = '{}'
+
+
+def _log_json(value: Any) -> str:
+    """序列化调用日志字段，空字典直接复用常量"""
+    if type(value) is dict and not value:
+        return _EMPTY_JSON_OBJECT
+    return json_dumps(value)
+
+
+def _serialize_api_call_log_row(row: tuple) -> tuple:
+    """序列化调用日志行中的请求头、请求体、查询参数、响应头和响应体（在写入线程中执行）"""
+    (log_id, endpoint_id, method, url, request_headers, request_body, request_params,
+     status_code, response_headers, response_body, response_time_ms, client_ip, user_agent, created_at) = row
+    return (
+        log_id, endpoint_id, method, url,
+        json_dumps(request_headers),
+        json_dumps(request_body) if request_body else None,
+        _log_json(request_params),
+        status_code,
+        _log_json(response_headers),
+        _log_json(response_body),
+        response_time_ms, client_ip, user_agent, created_at
+    )
+
+
+# 写入前需要转换的日志：SQL -> 行转换函数
+_LOG_ROW_SERIALIZERS = {_INSERT_API_CALL_LOG_SQL: _serialize_api_call_log_row}
+
+# 每个连接各自打开一个独立数据库的路径（内存库、临时库），后台线程的连接看不到这些库中的表
+_PRIVATE_DATABASE_PATHS = frozenset(('', ':memory:'))
+
+# SQLite 默认单条语句最多绑定 999 个参数
+_MAX_SQL_PARAMS = 999
+
+# 统计只做整数累加：累计响应时间 sum_response_time_ms，平均值由累计值 / 调用次数得出
+# （SET 右侧读取的是更新前的旧值）；状态码为 NULL 时比较结果也是 NULL，计数用 CASE 保持不变
+_UPDATE_ENDPOINT_STATS_SQL = '''
+    UPDATE api_endpoints 
+    SET call_count = call_count + 1,
+        success_count = CASE WHEN ? BETWEEN 200 AND 299 THEN success_count + 1 ELSE success_count END,
+        error_count = CASE WHEN ? >= 400 THEN error_count + 1 ELSE error_count END,
+        sum_response_time_ms = sum_response_time_ms + ?,
+        avg_response_time_ms = (sum_response_time_ms + ?) / (call_count + 1),
+        updated_at = ?
+    WHERE id = ?
+'''
+
+# 为旧库补充 sum_response_time_ms 列并按已有平均值回填；删除旧的统计触发器，由模式文件按新定义重建
+_ADD_SUM_RESPONSE_TIME_SQL = '''
+    ALTER TABLE api_endpoints ADD COLUMN sum_response_time_ms INTEGER DEFAULT 0;
+    UPDATE api_endpoints SET sum_response_time_ms = COALESCE(avg_response_time_ms, 0) * call_count;
+    DROP TRIGGER IF EXISTS update_endpoint_stats_trigger;
+'''
+
+# 列表查询 JOIN + ORDER BY 对应的复合索引之一（定义在模式文件中），不存在时说明索引是首次创建
+_COMPOSITE_INDEX_PROBE_SQL = "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_endpoints_doc_status_path'"
+
+
+def _generate_ids(count: int) -> List[str]:
+    """批量生成 32 位十六进制 ID，一次读取随机数以减少系统调用"""
+    buf = os.urandom(16 * count)
+    return [buf[i:i + 16].hex() for i in range(0, 16 * count, 16)]
+
+
+# 日志 ID：进程级随机前缀 + 自增计数，同为 32 位十六进制，无需每条日志读取随机数
+_log_id_prefix = os.urandom(8).hex()
+_log_id_counter = itertools.count(1)
+
+
+def _reset_log_ids():
+    global _log_id_prefix, _log_id_counter
+    _log_id_prefix = os.urandom(8).hex()
+    _log_id_counter = itertools.count(1)
+
+
+# fork 出的子进程重新生成前缀，避免与父进程产生重复 ID
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_log_ids)
+
+
+def new_log_id() -> str:
+    """生成日志记录 ID"""
+    return f"{_log_id_prefix}{next(_log_id_counter):016x}"
+
+
+def _split_sql_statements(lines: Iterable[str]) -> Iterator[str]:
+    """将 SQL 脚本按完整语句切分（由 sqlite3.complete_statement 处理字符串和触发器体中的分号）"""
+    buffer = []
+    for line in lines:
+        if not buffer and (not line.strip() or line.lstrip().startswith('--')):
+            continue
+        
+        buffer.append(line)
+        statement = ''.join(buffer)
+        if sqlite3.complete_statement(statement):
+            buffer = []
+            yield statement
+    
+    if buffer and ''.join(buffer).strip():
+        yield ''.join(buffer)
+
+
+@lru_cache(maxsize=128)
+def _multi_insert_sql(table: str, columns: Tuple[str, ...], row_count: int) -> str:
+    """生成多行 VALUES 的 INSERT 语句（按表/列/行数缓存）"""
+    placeholders = '(' + ', '.join('?' * len(columns)) + ')'
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ', '.join([placeholders] * row_count)
+
+
+def _rows_to_dicts(rows: List[sqlite3.Row], json_columns: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """批量将查询结果转换为字典，并只对 JSON 列做反序列化"""
+    if not rows:
+        return []
+    
+    # 列名与 JSON 列下标只计算一次，避免逐行 dict(row) 的重复键处理
+    keys = tuple(rows[0].keys())
+    json_idx = [i for i, key in enumerate(keys) if key in json_columns]
+    
+    if not json_idx:
+        return [dict(zip(keys, row)) for row in rows]
+    
+    loads = json_loads
+    results = []
+    for row in rows:
+        values = list(row)
+        for i in json_idx:
+            if values[i]:
+                values[i] = loads(values[i])
+        results.append(dict(zip(keys, values)))
+    return results
 
 
 class DatabaseManager:
@@ -19,21 +216,48 @@ class DatabaseManager:
     
     def __init__(self, config: DatabaseConfig):
         self.config = config
-        self.logger = logging.getLogger(__name__)
         self._connection = None
+        # Web 服务在线程池中并发调用，首次创建连接时加锁，避免重复建立连接
+        self._connection_lock = threading.Lock()
+        # 时间戳缓存：(毫秒数, 格式化结果)，整体替换，并发读取不会拿到不匹配的一对值
+        self._clock = (None, None)
+        # 待写入的 API 调用日志，攒够一批后一次性提交
+        self._pending_call_logs: List[tuple] = []
+        self._pending_auth_logs: List[tuple] = []
+        self._log_buffer_lock = threading.Lock()
+        # 攒满的日志批次交给后台写入线程，请求线程只负责入队；
+        # 队列有上限，写入跟不上时入队会阻塞请求线程（背压），避免积压的日志占满内存
+        # 队列元素：(sql, 日志行) 批次、刷新标记 Event 或停止信号 None
+        self._log_queue: "queue.Queue[Any]" = queue.Queue(
+            maxsize=config.log_queue_max_batches
+        )
+        self._log_writer: Optional[threading.Thread] = None
+        self._log_writer_lock = threading.Lock()
+        # 内存库/临时库只能通过本连接访问，不启动后台写入线程，日志批次在入队处直接写入
+        self._use_log_writer = config.path not in _PRIVATE_DATABASE_PATHS
     
     @property
     def connection(self):
         """获取数据库连接"""
-        if self._connection is None:
-            self._connection = sqlite3.connect(
-                self.config.path,
-                timeout=self.config.timeout,
-                check_same_thread=self.config.check_same_thread,
-                isolation_level=self.config.isolation_level
-            )
-            self._connection.row_factory = sqlite3.Row
-        return self._connection
+        connection = self._connection
+        if connection is None:
+            with self._connection_lock:
+                connection = self._connection
+                if connection is None:
+                    connection = self._connect(self.config.isolation_level)
+                    connection.row_factory = sqlite3.Row
+                    self._connection = connection
+        return connection
+    
+    def _connect(self, isolation_level: Optional[str]) -> sqlite3.Connection:
+        """按配置新建一个数据库连接"""
+        return sqlite3.connect(
+            self.config.path,
+            timeout=self.config.timeout,
+            check_same_thread=self.config.check_same_thread,
+            isolation_level=isolation_level,
+            cached_statements=self.config.cached_statements
+        )
     
     def initialize(self):
         """初始化数据库"""
@@ -42,42 +266,106 @@ class DatabaseManager:
         if not schema_file.exists():
             raise FileNotFoundError(f"数据库模式文件不存在: {schema_file}")
         
+        connection = self.connection
+        if connection.in_transaction:
+            connection.commit()
+        
         try:
-            with open(schema_file, 'r', encoding='utf-8') as f:
-                sql_content = f.read()
-            
-            self.connection.executescript(sql_content)
-            self.connection.commit()
-            self.logger.info("数据库初始化成功")
+            # 复合索引首次创建后需要 ANALYZE 收集统计，之后的启动不再全表扫描
+            analyze = connection.execute(_COMPOSITE_INDEX_PROBE_SQL).fetchone() is None
+            
+            # 整个模式在同一个事务中执行，失败时整体回滚
+            connection.execute('BEGIN')
+            try:
+                # 先升级旧库的表结构，模式文件中依赖新列的触发器随后按新定义创建
+                self._migrate_schema()
+                with open(schema_file, 'r', encoding='utf-8') as f:
+                    self._execute_statements(f)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            
+            if analyze:
+                connection.execute('ANALYZE')
+                connection.commit()
+            _logger.info("数据库初始化成功")
             
         except Exception as e:
-            self.logger.error(f"数据库初始化失败: {e}")
+            _logger.error("数据库初始化失败: %s", e)
             raise
     
+    def _execute_statements(self, lines: Iterable[str]):
+        """逐条执行 SQL 脚本中的语句（不像 executescript 那样隐式提交）"""
+        for statement in _split_sql_statements(lines):
+            self.connection.execute(statement)
+    
+    def _migrate_schema(self):
+        """升级已有数据库结构"""
+        # 新库还没有 api_endpoints 表，由模式文件直接建出完整结构
+        columns = {row['name'] for row in self.connection.execute('PRAGMA table_info(api_endpoints)')}
+        if not columns:
+            return
+        
+        if 'sum_response_time_ms' not in columns:
+            self._execute_statements(_ADD_SUM_RESPONSE_TIME_SQL.splitlines(keepends=True))
+    
     @contextmanager
     def get_cursor(self):
         """获取数据库游标的上下文管理器"""
-        cursor = self.connection.cursor()
+        # 连接只取一次，提交/回滚不再重复经过 connection 属性的检查
+        connection = self.connection
+        cursor = connection.cursor()
         try:
             yield cursor
-            self.connection.commit()
+            connection.commit()
         except Exception as e:
-            self.connection.rollback()
+            connection.rollback()
             raise
         finally:
             cursor.close()
     
+    def _multi_insert(self, cursor, table: str, columns: Tuple[str, ...], rows: List[tuple]):
+        """多行 VALUES 批量插入，超过参数上限时分块执行"""
+        chunk_size = max(1, _MAX_SQL_PARAMS // len(columns))
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            cursor.execute(_multi_insert_sql(table, columns, len(chunk)), list(chain.from_iterable(chunk)))
+    
     def close(self):
         """关闭数据库连接"""
+        # 两类日志的剩余批次一起入队，停止写入线程时统一等待写完，不再逐类等待
+        with self._log_buffer_lock:
+            call_rows, self._pending_call_logs = self._pending_call_logs, []
+            auth_rows, self._pending_auth_logs = self._pending_auth_logs, []
+        if call_rows:
+            self._enqueue_log_batch(_INSERT_API_CALL_LOG_SQL, call_rows)
+        if auth_rows:
+            self._enqueue_log_batch(_INSERT_AUTH_LOG_SQL, auth_rows)
+        self._stop_log_writer()
         if self._connection:
+            try:
+                self._connection.execute('PRAGMA optimize')
+            except sqlite3.Error as e:
+                _logger.warning("数据库优化失败: %s", e)
             self._connection.close()
             self._connection = None
     
+    def now_iso(self) -> str:
+        """获取当前时间的 ISO 字符串，同一毫秒内复用已格式化的结果；
+        精度为毫秒，始终带 6 位小数（如 2024-01-01T12:00:00.123000），可被 datetime.fromisoformat 解析"""
+        now_ms = time.time_ns() // 1_000_000
+        clock_ms, clock_iso = self._clock
+        if now_ms != clock_ms:
+            clock_iso = datetime.fromtimestamp(now_ms / 1000).isoformat(timespec='microseconds')
+            self._clock = (now_ms, clock_iso)
+        return clock_iso
+    
     # OpenAPI 模板管理
     def create_template(self, name: str, content: str) -> str:
         """创建 OpenAPI 模板"""
-        template_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
+        template_id = uuid.uuid4().hex
+        now = self.now_iso()
         
         with self.get_cursor() as cursor:
             cursor.execute('''
@@ -85,15 +373,13 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (template_id, name, content, 'active', now, now))
         
-        self.logger.info(f"创建模板: {name} (ID: {template_id})")
+        _logger.info("创建模板: %s (ID: %s)", name, template_id)
         return template_id
     
     def get_template(self, template_id: str) -> Optional[Dict[str, Any]]:
         """获取模板"""
         with self.get_cursor() as cursor:
-            cursor.execute('''
-                SELECT * FROM openapi_templates WHERE id = ?
-            ''', (template_id,))
+            cursor.execute(_GET_TEMPLATE_SQL, (template_id,))
             
             row = cursor.fetchone()
             return dict(row) if row else None
@@ -101,36 +387,31 @@ class DatabaseManager:
     def list_templates(self, status: str = 'active') -> List[Dict[str, Any]]:
         """列出模板"""
         with self.get_cursor() as cursor:
-            cursor.execute('''
-                SELECT * FROM openapi_templates WHERE status = ? ORDER BY created_at DESC
+            cursor.execute(f'''
+                SELECT {_TEMPLATE_LIST_COLUMNS} FROM openapi_templates WHERE status = ? ORDER BY created_at DESC
             ''', (status,))
             
             return [dict(row) for row in cursor.fetchall()]
     
+    def get_template_content(self, template_id: str) -> Optional[str]:
+        """获取模板内容"""
+        with self.get_cursor() as cursor:
+            cursor.execute('SELECT content FROM openapi_templates WHERE id = ?', (template_id,))
+            
+            row = cursor.fetchone()
+            return row['content'] if row else None
+    
     def update_template(self, template_id: str, name: str = None, content: str = None) -> bool:
-        """更新模板"""
-        updates = []
-        params = []
-        
-        if name is not None:
-            updates.append("name = ?")
-            params.append(name)
-        
-        if content is not None:
-            updates.append("content = ?")
-            params.append(content)
-        
-        if not updates:
+        """更新模板（字段值未变化时不写入，返回 False）"""
+        mask = (name is not None) | (content is not None) << 1
+        if not mask:
             return False
         
-        updates.append("updated_at = ?")
-        params.append(datetime.now().isoformat())
-        params.append(template_id)
+        values = [value for value in (name, content) if value is not None]
         
+        # 只有至少一个字段发生变化时才命中 WHERE，避免无意义的写入和提交
         with self.get_cursor() as cursor:
-            cursor.execute(f'''
-                UPDATE openapi_templates SET {', '.join(updates)} WHERE id = ?
-            ''', params)
+            cursor.execute(_UPDATE_TEMPLATE_SQL[mask], values + [self.now_iso(), template_id] + values)
             
             return cursor.rowcount > 0
     
@@ -139,7 +420,7 @@ class DatabaseManager:
         with self.get_cursor() as cursor:
             cursor.execute('''
                 UPDATE openapi_templates SET status = 'deleted', updated_at = ? WHERE id = ?
-            ''', (datetime.now().isoformat(), template_id))
+            ''', (self.now_iso(), template_id))
             
             return cursor.rowcount > 0
     
@@ -147,8 +428,8 @@ class DatabaseManager:
     def create_api_document(self, template_id: str, name: str, version: str = None, 
                            base_url: str = None) -> str:
         """创建 API 文档"""
-        doc_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
+        doc_id = uuid.uuid4().hex
+        now = self.now_iso()
         
         with self.get_cursor() as cursor:
             cursor.execute('''
@@ -156,14 +437,14 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (doc_id, template_id, name, version, base_url, 'active', now, now))
         
-        self.logger.info(f"创建API文档: {name} (ID: {doc_id})")
+        _logger.info("创建API文档: %s (ID: %s)", name, doc_id)
         return doc_id
     
     def get_api_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """获取 API 文档"""
         with self.get_cursor() as cursor:
-            cursor.execute('''
-                SELECT d.*, t.name as template_name, t.content as template_content
+            cursor.execute(f'''
+                SELECT {_DOCUMENT_COLUMNS}, t.name as template_name, t.content as template_content
                 FROM api_documents d
                 JOIN openapi_templates t ON d.template_id = t.id
                 WHERE d.id = ?
@@ -175,8 +456,8 @@ class DatabaseManager:
     def list_api_documents(self, status: str = 'active') -> List[Dict[str, Any]]:
         """列出 API 文档"""
         with self.get_cursor() as cursor:
-            cursor.execute('''
-                SELECT d.*, t.name as template_name
+            cursor.execute(f'''
+                SELECT {_DOCUMENT_COLUMNS}, t.name as template_name
                 FROM api_documents d
                 JOIN openapi_templates t ON d.template_id = t.id
                 WHERE d.status = ? ORDER BY d.created_at DESC
@@ -189,84 +470,116 @@ class DatabaseManager:
                        operation_id: str = None, summary: str = None, 
                        description: str = None, tags: List[str] = None) -> str:
         """创建 API 端点"""
-        endpoint_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
-        tags_json = json.dumps(tags) if tags else None
+        endpoint_id = uuid.uuid4().hex
+        now = self.now_iso()
+        tags_json = json_dumps(tags) if tags else None
         
         with self.get_cursor() as cursor:
-            cursor.execute('''
-                INSERT INTO api_endpoints 
-                (id, api_document_id, path, method, operation_id, summary, description, tags, status, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (endpoint_id, api_document_id, path, method, operation_id, summary, 
-                  description, tags_json, 'active', now, now))
+            cursor.execute(_INSERT_ENDPOINT_SQL, (endpoint_id, api_document_id, path, method, operation_id,
+                                                  summary, description, tags_json, now, now))
         
-        self.logger.info(f"创建端点: {method} {path} (ID: {endpoint_id})")
+        _logger.info("创建端点: %s %s (ID: %s)", method, path, endpoint_id)
         return endpoint_id
     
+    def bulk_create_endpoints(self, api_document_id: str, endpoints: List[Dict[str, Any]]) -> List[str]:
+        """批量创建 API 端点（导入整份文档时优先使用）"""
+        if not endpoints:
+            return []
+        
+        count = len(endpoints)
+        endpoint_ids = _generate_ids(count)
+        now = self.now_iso()
+        
+        # 按列准备参数，JSON 列整列序列化，再用多行 INSERT 写入
+        paths = [endpoint['path'] for endpoint in endpoints]
+        methods = [endpoint['method'] for endpoint in endpoints]
+        operation_ids = [endpoint.get('operation_id') for endpoint in endpoints]
+        summaries = [endpoint.get('summary') for endpoint in endpoints]
+        descriptions = [endpoint.get('description') for endpoint in endpoints]
+        tags_json = [json_dumps(tags) if tags else None for tags in (endpoint.get('tags') for endpoint in endpoints)]
+        
+        rows = list(zip(endpoint_ids, repeat(api_document_id, count), paths, methods, operation_ids,
+                        summaries, descriptions, tags_json, repeat('active', count),
+                        repeat(now, count), repeat(now, count)))
+        
+        with self.get_cursor() as cursor:
+            self._multi_insert(cursor, 'api_endpoints', _ENDPOINT_INSERT_COLUMNS, rows)
+        
+        _logger.info("批量创建端点: %s 个 (文档ID: %s)", count, api_document_id)
+        return endpoint_ids
+    
     def get_endpoint(self, endpoint_id: str) -> Optional[Dict[str, Any]]:
         """获取端点"""
         with self.get_cursor() as cursor:
-            cursor.execute('''
-                SELECT e.*, d.name as api_name, d.base_url
-                FROM api_endpoints e
-                JOIN api_documents d ON e.api_document_id = d.id
-                WHERE e.id = ?
-            ''', (endpoint_id,))
+            cursor.execute(_GET_ENDPOINT_SQL, (endpoint_id,))
             
             row = cursor.fetchone()
             if row:
                 result = dict(row)
                 if result.get('tags'):
-                    result['tags'] = json.loads(result['tags'])
+                    result['tags'] = json_loads(result['tags'])
                 return result
             return None
     
+    def _execute_list_endpoints(self, cursor, api_document_id: str = None, status: str = 'active'):
+        """执行端点列表查询"""
+        if api_document_id:
+            cursor.execute(f'''
+                SELECT {_ENDPOINT_LIST_COLUMNS}, e.description, d.name as api_name, d.base_url
+                FROM api_endpoints e
+                JOIN api_documents d ON e.api_document_id = d.id
+                WHERE e.api_document_id = ? AND e.status = ?
+                ORDER BY e.path, e.method
+            ''', (api_document_id, status))
+        else:
+            cursor.execute(f'''
+                SELECT {_ENDPOINT_LIST_COLUMNS}, e.description, d.name as api_name, d.base_url
+                FROM api_endpoints e
+                JOIN api_documents d ON e.api_document_id = d.id
+                WHERE e.status = ?
+                ORDER BY d.name, e.path, e.method
+            ''', (status,))
+    
     def list_endpoints(self, api_document_id: str = None, status: str = 'active') -> List[Dict[str, Any]]:
         """列出端点"""
+        with self.get_cursor() as cursor:
+            self._execute_list_endpoints(cursor, api_document_id, status)
+            return _rows_to_dicts(cursor.fetchall(), ('tags',))
+    
+    def list_endpoint_rows(self, api_document_id: str = None, status: str = 'active') -> List[sqlite3.Row]:
+        """列出端点的路由信息（id/path/method），直接返回 sqlite3.Row 供内部按列读取，不做字典拷贝"""
         with self.get_cursor() as cursor:
             if api_document_id:
                 cursor.execute('''
-                    SELECT e.*, d.name as api_name, d.base_url
-                    FROM api_endpoints e
-                    JOIN api_documents d ON e.api_document_id = d.id
-                    WHERE e.api_document_id = ? AND e.status = ?
-                    ORDER BY e.path, e.method
+                    SELECT id, api_document_id, path, method FROM api_endpoints
+                    WHERE api_document_id = ? AND status = ?
+                    ORDER BY path, method
                 ''', (api_document_id, status))
             else:
                 cursor.execute('''
-                    SELECT e.*, d.name as api_name, d.base_url
-                    FROM api_endpoints e
-                    JOIN api_documents d ON e.api_document_id = d.id
-                    WHERE e.status = ?
-                    ORDER BY d.name, e.path, e.method
+                    SELECT id, api_document_id, path, method FROM api_endpoints
+                    WHERE status = ?
+                    ORDER BY path, method
                 ''', (status,))
             
-            results = []
-            for row in cursor.fetchall():
-                result = dict(row)
-                if result.get('tags'):
-                    result['tags'] = json.loads(result['tags'])
-                results.append(result)
-            
-            return results
+            return cursor.fetchall()
     
     # 认证配置管理
     def create_auth_config(self, api_document_id: str, auth_type: str, auth_config: Dict[str, Any],
                           is_required: bool = True, is_global: bool = False, priority: int = 0) -> str:
         """创建认证配置"""
-        auth_config_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
+        auth_config_id = uuid.uuid4().hex
+        now = self.now_iso()
         
         with self.get_cursor() as cursor:
             cursor.execute('''
                 INSERT INTO api_auth_configs 
                 (id, api_document_id, auth_type, auth_config, is_required, is_global, priority, status, created_at, updated_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (auth_config_id, api_document_id, auth_type, json.dumps(auth_config), 
+            ''', (auth_config_id, api_document_id, auth_type, json_dumps(auth_config), 
                   is_required, is_global, priority, 'active', now, now))
         
-        self.logger.info(f"创建认证配置: {auth_type} (ID: {auth_config_id})")
+        _logger.info("创建认证配置: %s (ID: %s)", auth_type, auth_config_id)
         return auth_config_id
     
     def get_auth_config(self, auth_config_id: str) -> Optional[Dict[str, Any]]:
@@ -279,7 +592,7 @@ class DatabaseManager:
             row = cursor.fetchone()
             if row:
                 result = dict(row)
-                result['auth_config'] = json.loads(result['auth_config'])
+                result['auth_config'] = json_loads(result['auth_config'])
                 return result
             return None
     
@@ -300,24 +613,17 @@ class DatabaseManager:
             query += " ORDER BY priority DESC, created_at DESC"
             
             cursor.execute(query, params)
-            
-            results = []
-            for row in cursor.fetchall():
-                result = dict(row)
-                result['auth_config'] = json.loads(result['auth_config'])
-                results.append(result)
-            
-            return results
+            return _rows_to_dicts(cursor.fetchall(), ('auth_config',))
     
     # 用户管理
     def create_user(self, username: str, email: str, password_hash: str, 
                    role: str = 'user', permissions: Dict[str, Any] = None, salt: str = None) -> str:
         """创建用户"""
-        user_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
+        user_id = uuid.uuid4().hex
+        now = self.now_iso()
         if salt is None:
             salt = str(uuid.uuid4())
-        permissions_json = json.dumps(permissions) if permissions else None
+        permissions_json = json_dumps(permissions) if permissions else None
         
         with self.get_cursor() as cursor:
             cursor.execute('''
@@ -326,7 +632,7 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (user_id, username, email, password_hash, salt, role, permissions_json, 1, now, now))
         
-        self.logger.info(f"创建用户: {username} (ID: {user_id})")
+        _logger.info("创建用户: %s (ID: %s)", username, user_id)
         return user_id
     
     def get_user(self, user_id: str = None, username: str = None, email: str = None) -> Optional[Dict[str, Any]]:
@@ -345,7 +651,7 @@ class DatabaseManager:
             if row:
                 result = dict(row)
                 if result.get('permissions'):
-                    result['permissions'] = json.loads(result['permissions'])
+                    result['permissions'] = json_loads(result['permissions'])
                 # 确保 salt 字段存在
                 if 'salt' not in result:
                     result['salt'] = None
@@ -365,50 +671,30 @@ class DatabaseManager:
             query += " ORDER BY created_at DESC"
             
             cursor.execute(query, params)
-            
-            results = []
-            for row in cursor.fetchall():
-                result = dict(row)
-                if result.get('permissions'):
-                    result['permissions'] = json.loads(result['permissions'])
-                results.append(result)
-            
-            return results
+            return _rows_to_dicts(cursor.fetchall(), ('permissions',))
     
     # 统计信息
     def get_statistics(self) -> Dict[str, Any]:
         """获取统计信息"""
+        # 统计读取需要最新的计数，先写入缓冲的调用日志；端点查询等读取路径不刷新，计数可能滞后一个批次
+        self.flush_api_call_logs()
         with self.get_cursor() as cursor:
-            stats = {}
-            
-            # 模板统计
-            cursor.execute('SELECT COUNT(*) as count FROM openapi_templates WHERE status = "active"')
-            stats['templates'] = cursor.fetchone()['count']
-            
-            # API文档统计
-            cursor.execute('SELECT COUNT(*) as count FROM api_documents WHERE status = "active"')
-            stats['api_documents'] = cursor.fetchone()['count']
-            
-            # 端点统计
-            cursor.execute('SELECT COUNT(*) as count FROM api_endpoints WHERE status = "active"')
-            stats['endpoints'] = cursor.fetchone()['count']
-            
-            # 用户统计
-            cursor.execute('SELECT COUNT(*) as count FROM gateway_users WHERE is_active = 1')
-            stats['users'] = cursor.fetchone()['count']
-            
-            # 认证配置统计
-            cursor.execute('SELECT COUNT(*) as count FROM api_auth_configs WHERE status = "active"')
-            stats['auth_configs'] = cursor.fetchone()['count']
-            
-            # API调用统计
-            cursor.execute('SELECT COUNT(*) as count FROM api_call_logs')
-            stats['api_calls'] = cursor.fetchone()['count']
-            
-            return stats
+            # 一次查询取回全部计数，避免多次 prepare/执行
+            cursor.execute('''
+                SELECT
+                    (SELECT COUNT(*) FROM openapi_templates WHERE status = 'active') AS templates,
+                    (SELECT COUNT(*) FROM api_documents WHERE status = 'active') AS api_documents,
+                    (SELECT COUNT(*) FROM api_endpoints WHERE status = 'active') AS endpoints,
+                    (SELECT COUNT(*) FROM gateway_users WHERE is_active = 1) AS users,
+                    (SELECT COUNT(*) FROM api_auth_configs WHERE status = 'active') AS auth_configs,
+                    (SELECT COUNT(*) FROM api_call_logs) AS api_calls
+            ''')
+            
+            return dict(cursor.fetchone())
     
     def get_endpoint_statistics(self, endpoint_id: str) -> Dict[str, Any]:
         """获取端点统计信息"""
+        self.flush_api_call_logs()
         with self.get_cursor() as cursor:
             cursor.execute('''
                 SELECT call_count, success_count, error_count, avg_response_time_ms
@@ -420,19 +706,194 @@ class DatabaseManager:
                 return dict(row)
             return {}
     
+    def add_api_call_log(self, log_row: tuple):
+        """缓冲一条 API 调用日志，达到批量大小时交给后台线程写入；
+        日志行中的 JSON 字段传原始对象，由写入线程序列化，请求路径上不做序列化"""
+        if self._log_writer is None and self._use_log_writer:
+            self._start_log_writer()
+        # 请求在线程池中并发记录日志，追加与取出批次需在同一把锁内完成，否则追加到已取走的列表会丢日志
+        with self._log_buffer_lock:
+            self._pending_call_logs.append(log_row)
+            if len(self._pending_call_logs) < self.config.call_log_batch_size:
+                return
+            rows, self._pending_call_logs = self._pending_call_logs, []
+        self._enqueue_log_batch(_INSERT_API_CALL_LOG_SQL, rows)
+    
+    def flush_api_call_logs(self):
+        """将缓冲的 API 调用日志全部写入，返回时已可查询"""
+        with self._log_buffer_lock:
+            rows, self._pending_call_logs = self._pending_call_logs, []
+        if rows:
+            self._enqueue_log_batch(_INSERT_API_CALL_LOG_SQL, rows)
+        self._wait_log_writer()
+    
+    def add_auth_log(self, log_row: tuple):
+        """缓冲一条认证日志，达到批量大小时交给后台线程写入"""
+        if self._log_writer is None and self._use_log_writer:
+            self._start_log_writer()
+        with self._log_buffer_lock:
+            self._pending_auth_logs.append(log_row)
+            if len(self._pending_auth_logs) < self.config.auth_log_batch_size:
+                return
+            rows, self._pending_auth_logs = self._pending_auth_logs, []
+        self._enqueue_log_batch(_INSERT_AUTH_LOG_SQL, rows)
+    
+    def flush_auth_logs(self):
+        """将缓冲的认证日志全部写入，返回时已可查询"""
+        with self._log_buffer_lock:
+            rows, self._pending_auth_logs = self._pending_auth_logs, []
+        if rows:
+            self._enqueue_log_batch(_INSERT_AUTH_LOG_SQL, rows)
+        self._wait_log_writer()
+    
+    def _enqueue_log_batch(self, sql: str, rows: List[tuple]):
+        """把一批日志放入写入队列，首次使用时启动后台写入线程；内存库/临时库直接通过本连接写入"""
+        if not self._use_log_writer:
+            self._write_log_rows(self.connection, sql, rows)
+            return
+        self._put_log_item((sql, rows))
+    
+    def _put_log_item(self, item: Any):
+        """放入写入队列；写入线程未启动或已退出（如 fork 出的子进程中）时先启动，
+        队列满时每隔 log_flush_interval 秒检查一次写入线程，重启后仍退出则抛出 RuntimeError，请求线程不会永久阻塞"""
+        restarted = False
+        while True:
+            writer = self._log_writer
+            if writer is None or not writer.is_alive():
+                if restarted:
+                    raise RuntimeError("日志写入线程已退出，日志无法写入")
+                restarted = writer is not None
+                self._start_log_writer(writer)
+            try:
+                self._log_queue.put(item, timeout=self.config.log_flush_interval)
+                return
+            except queue.Full:
+                continue
+    
+    def _start_log_writer(self, dead_writer: Optional[threading.Thread] = None):
+        """启动后台写入线程；已由其他线程启动时不重复创建，传入已退出的线程时替换它"""
+        with self._log_writer_lock:
+            if self._log_writer is dead_writer:
+                if dead_writer is not None:
+                    _logger.warning("日志写入线程已退出，重新启动")
+                writer = threading.Thread(target=self._log_writer_loop, name='stepflow-log-writer', daemon=True)
+                writer.start()
+                self._log_writer = writer
+    
+    def _log_writer_loop(self):
+        """后台写入线程：逐批取出日志并用 executemany 写入，收到 None 时退出；
+        空闲超过 log_flush_interval 秒时写入尚未攒满的日志，低流量时日志也不会长期停留在内存中"""
+        # 写入线程使用独立连接并自行控制事务，提交/回滚不会影响请求线程在共享连接上的事务
+        connection = self._connect(None)
+        log_queue = self._log_queue
+        flush_interval = self.config.log_flush_interval
+        try:
+            while True:
+                try:
+                    item = log_queue.get(timeout=flush_interval)
+                except queue.Empty:
+                    self._write_pending_logs(connection)
+                    continue
+                if item is None:
+                    return
+                if isinstance(item, threading.Event):
+                    # 刷新标记：队列先进先出，取到标记时它之前入队的批次都已写完
+                    item.set()
+                    continue
+                try:
+                    self._write_log_rows(connection, *item)
+                except Exception as e:
+                    _logger.error("批量写入日志失败: %s", e)
+        finally:
+            connection.close()
+    
+    def _write_pending_logs(self, connection: sqlite3.Connection):
+        """在写入线程中直接写入两类日志缓冲区中未攒满的部分"""
+        with self._log_buffer_lock:
+            call_rows, self._pending_call_logs = self._pending_call_logs, []
+            auth_rows, self._pending_auth_logs = self._pending_auth_logs, []
+        for sql, rows in ((_INSERT_API_CALL_LOG_SQL, call_rows), (_INSERT_AUTH_LOG_SQL, auth_rows)):
+            if rows:
+                try:
+                    self._write_log_rows(connection, sql, rows)
+                except Exception as e:
+                    _logger.error("批量写入日志失败: %s", e)
+    
+    def _write_log_rows(self, connection: sqlite3.Connection, sql: str, rows: List[tuple]):
+        """在一个事务中写入一批日志，需要序列化的日志行先在此转换；
+        整批失败时回滚并逐条重写，只丢弃本身无法写入的行"""
+        serializer = _LOG_ROW_SERIALIZERS.get(sql)
+        try:
+            connection.execute('BEGIN')
+            try:
+                connection.executemany(sql, map(serializer, rows) if serializer else rows)
+                connection.commit()
+                return
+            except Exception:
+                connection.rollback()
+                raise
+        except Exception as e:
+            _logger.warning("批量写入 %s 条日志失败，改为逐条写入: %s", len(rows), e)
+        
+        dropped = 0
+        for row in rows:
+            try:
+                connection.execute(sql, serializer(row) if serializer else row)
+            except Exception as e:
+                dropped += 1
+                _logger.error("写入日志失败，已丢弃 (ID: %s): %s", row[0], e)
+        if connection.in_transaction:
+            connection.commit()
+        if dropped:
+            _logger.error("本批 %s 条日志中有 %s 条未能写入", len(rows), dropped)
+    
+    def _wait_log_writer(self):
+        """等待调用前已入队的日志全部写完；之后其他线程入队的批次不在等待范围内，持续写日志时读取也不会一直阻塞"""
+        writer = self._log_writer
+        if writer is None:
+            return
+        written = threading.Event()
+        self._put_log_item(written)
+        # 写入线程已退出（如并发 close）时标记不会再被处理，不再继续等待
+        while not written.wait(self.config.log_flush_interval):
+            writer = self._log_writer
+            if writer is None or not writer.is_alive():
+                return
+    
+    def _stop_log_writer(self):
+        """写完剩余日志后停止后台写入线程；最多等待 timeout 秒，超时后报告仍未写入的日志条数"""
+        with self._log_writer_lock:
+            writer, self._log_writer = self._log_writer, None
+        if writer is None:
+            return
+        timeout = self.config.timeout
+        if writer.is_alive():
+            try:
+                self._log_queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            writer.join(timeout)
+        if writer.is_alive() or not self._log_queue.empty():
+            _logger.error("日志写入线程未在 %s 秒内写完，%s 条日志未写入", timeout, self._drain_log_queue())
+    
+    def _drain_log_queue(self) -> int:
+        """清空写入队列并返回其中日志的条数，同时释放等待中的刷新标记"""
+        count = 0
+        while True:
+            try:
+                item = self._log_queue.get_nowait()
+            except queue.Empty:
+                return count
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not None:
+                count += len(item[1])
+    
     def update_endpoint_stats(self, endpoint_id: str, response_status_code: int, response_time_ms: int):
         """更新端点统计信息"""
+        # 每次调用使用独立游标（固定 SQL 文本仍命中连接的语句缓存），多线程并发调用时不共享游标
         with self.get_cursor() as cursor:
-            cursor.execute('''
-                UPDATE api_endpoints 
-                SET call_count = call_count + 1,
-                    success_count = CASE WHEN ? BETWEEN 200 AND 299 THEN success_count + 1 ELSE success_count END,
-                    error_count = CASE WHEN ? >= 400 THEN error_count + 1 ELSE error_count END,
-                    avg_response_time_ms = CASE 
-                        WHEN avg_response_time_ms IS NULL THEN ?
-                        ELSE (avg_response_time_ms + ?) / 2
-                    END,
-                    updated_at = ?
-                WHERE id = ?
-            ''', (response_status_code, response_status_code, response_time_ms, 
-                  response_time_ms, datetime.now().isoformat(), endpoint_id)) 
\ No newline at end of file
+            cursor.execute(_UPDATE_ENDPOINT_STATS_SQL, (
+                response_status_code, response_status_code, response_time_ms,
+                response_time_ms, self.now_iso(), endpoint_id
+            ))
@@ -4,10 +4,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import uvicorn
-import json
+import anyio
 
 from .core.config import GatewayConfig
 from .core.gateway import StepFlowGateway
+from .core.serialization import loads as json_loads
 
 # 初始化 FastAPI 应用
 app = FastAPI(title="StepFlow Gateway API", version="1.0.0")
@@ -32,6 +33,17 @@ except Exception as e:
     print(f"❌ StepFlow Gateway 初始化失败: {e}")
     # 继续运行，但某些功能可能不可用
 
+# 上游 API 调用使用独立的固定大小线程池，慢速上游不会占满其他接口共用的默认线程池
+_UPSTREAM_CALL_WORKERS = 16
+_upstream_limiter: Optional[anyio.CapacityLimiter] = None
+
+def _get_upstream_limiter() -> anyio.CapacityLimiter:
+    """获取上游调用线程池的容量限制（需在事件循环中创建）"""
+    global _upstream_limiter
+    if _upstream_limiter is None:
+        _upstream_limiter = anyio.CapacityLimiter(_UPSTREAM_CALL_WORKERS)
+    return _upstream_limiter
+
 # Pydantic 请求模型
 class UserRegisterRequest(BaseModel):
     username: str
@@ -140,25 +152,16 @@ def list_endpoints_detailed(api_document_id: str = None):
     """返回详细端点信息，含参数、响应、tags、operationId、security"""
     endpoints = gateway.list_endpoints(api_document_id=api_document_id)
     # 详细结构补充
-    api = None
-    if api_document_id:
-        api = gateway.get_api(api_document_id)
-        openapi_content = api.get("openapi_content") or api.get("content")
-        if openapi_content:
-            try:
-                openapi_doc = json.loads(openapi_content)
-            except Exception:
-                openapi_doc = None
-        else:
-            openapi_doc = None
-    else:
-        openapi_doc = None
+    # 与 list_endpoints 共用同一份已解析的 OpenAPI 内容，不再重复解析
+    openapi_doc = gateway.api_manager.get_openapi_doc(api_document_id) if api_document_id else None
+    # paths 在循环外取一次，避免每个端点重复查找并分配默认空字典
+    paths = (openapi_doc.get("paths") or {}) if openapi_doc else None
     detailed = []
     for ep in endpoints:
         detail = dict(ep)
         # 尝试补充参数、响应、tags、operationId、security
-        if openapi_doc:
-            path_item = openapi_doc.get("paths", {}).get(ep["path"], {})
+        if paths is not None:
+            path_item = paths.get(ep["path"], {})
             method_item = path_item.get(ep["method"].lower(), {})
             detail["parameters"] = method_item.get("parameters", [])
             detail["requestBody"] = method_item.get("requestBody")
@@ -173,7 +176,8 @@ def list_endpoints_detailed(api_document_id: str = None):
 def search_endpoints(q: str, api_document_id: Optional[str] = None):
     """搜索端点，支持按路径、方法、摘要、描述搜索"""
     try:
-        endpoints = gateway.list_endpoints(api_document_id=api_document_id)
+        # 需要按描述搜索，列表查询带上 description
+        endpoints = gateway.list_endpoints(api_document_id=api_document_id, include_description=True)
         if not q:
             return {"success": True, "endpoints": endpoints}
         
@@ -223,7 +227,7 @@ def list_auth_configs_detailed(api_document_id: Optional[str] = None, auth_type:
         detail = dict(config)
         # 解析认证配置JSON
         try:
-            auth_config = json.loads(config.get("auth_config", "{}"))
+            auth_config = json_loads(config.get("auth_config", "{}"))
             detail["auth_config_parsed"] = auth_config
         except Exception:
             detail["auth_config_parsed"] = {}
@@ -238,7 +242,7 @@ def get_auth_config_detailed(auth_config_id: str):
         raise HTTPException(status_code=404, detail="Auth config not found")
     # 解析认证配置JSON
     try:
-        auth_config = json.loads(config.get("auth_config", "{}"))
+        auth_config = json_loads(config.get("auth_config", "{}"))
         config["auth_config_parsed"] = auth_config
     except Exception:
         config["auth_config_parsed"] = {}
@@ -288,10 +292,14 @@ async def call_api_by_path(request: Request):
         if not path or not method:
             raise HTTPException(status_code=400, detail="path and method are required")
         
-        # 从请求体获取请求数据
-        request_data = await request.json()
+        # 从请求体获取请求数据（直接解析原始字节，不先解码成 str）
+        request_data = json_loads(await request.body())
         
-        result = gateway.call_api_by_path(path, method, request_data, api_document_id)
+        # 上游 HTTP 调用与日志写入都是阻塞操作，放到线程池执行，避免阻塞事件循环
+        result = await anyio.to_thread.run_sync(
+            gateway.call_api_by_path, path, method, request_data, api_document_id,
+            limiter=_get_upstream_limiter()
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -339,12 +347,13 @@ def create_session(user_id: str, client_info: Optional[Dict[str, Any]] = None):
 async def validate_session(request: Request):
     """验证会话令牌"""
     try:
-        data = await request.json()
+        data = json_loads(await request.body())
         session_token = data.get("session_token")
         if not session_token:
             raise HTTPException(status_code=400, detail="session_token is required")
         
-        result = gateway.validate_session(session_token)
+        # 会话校验要查询数据库，放到线程池执行，避免阻塞事件循环
+        result = await anyio.to_thread.run_sync(gateway.validate_session, session_token)
         return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -389,6 +398,10 @@ def get_resource_references(resource_type: Optional[str] = None, resource_id: Op
 @app.get("/apis/{api_id}/openapi")
 def get_openapi_doc(api_id: str):
     """返回注册时的 OpenAPI 原文档（JSON）"""
+    # 优先复用已解析的 OpenAPI 内容，前端反复拉取时不再重复解析
+    openapi_doc = gateway.api_manager.get_openapi_doc(api_id)
+    if openapi_doc is not None:
+        return {"success": True, "openapi": openapi_doc}
     api = gateway.get_api(api_id)
     if not api:
         raise HTTPException(status_code=404, detail="API not found")
@@ -407,7 +420,7 @@ def get_openapi_doc(api_id: str):
     if not openapi_content:
         raise HTTPException(status_code=404, detail="OpenAPI content not found")
     try:
-        return {"success": True, "openapi": json.loads(openapi_content)}
+        return {"success": True, "openapi": json_loads(openapi_content)}
     except Exception:
         return {"success": True, "openapi": openapi_content}
 
@@ -415,21 +428,26 @@ def get_openapi_doc(api_id: str):
 def get_api_tags(api_id: str):
     """获取API文档的所有tags，用于前端分组展示"""
     try:
-        api = gateway.get_api(api_id)
-        if not api:
-            raise HTTPException(status_code=404, detail="API not found")
-        
-        openapi_content = api.get("openapi_content") or api.get("content")
-        if not openapi_content:
-            db = gateway.db_manager
-            with db.get_cursor() as cursor:
-                cursor.execute("SELECT content FROM openapi_templates WHERE id = ?", (api.get("template_id"),))
-                row = cursor.fetchone()
-                if row:
-                    openapi_content = row[0]
+        # 优先复用已解析的 OpenAPI 内容，内容未变化时不再重复解析整个文档
+        openapi_doc = gateway.api_manager.get_openapi_doc(api_id)
+        if openapi_doc is None:
+            api = gateway.get_api(api_id)
+            if not api:
+                raise HTTPException(status_code=404, detail="API not found")
+            
+            openapi_content = api.get("openapi_content") or api.get("content")
+            if not openapi_content:
+                db = gateway.db_manager
+                with db.get_cursor() as cursor:
+                    cursor.execute("SELECT content FROM openapi_templates WHERE id = ?", (api.get("template_id"),))
+                    row = cursor.fetchone()
+                    if row:
+                        openapi_content = row[0]
+            
+            if openapi_content:
+                openapi_doc = json_loads(openapi_content)
         
-        if openapi_content:
-            openapi_doc = json.loads(openapi_content)
+        if openapi_doc is not None:
             tags = openapi_doc.get("tags", [])
             return {"success": True, "tags": tags}
         else:
@@ -512,7 +530,8 @@ def get_api_complete_info(api_id: str):
         
         # 获取资源引用
         resource_refs = gateway.get_resource_references()
-        api_refs = [ref for ref in resource_refs if ref.get("api_endpoint_id") in [ep.get("id") for ep in endpoints]]
+        endpoint_ids = frozenset(ep.get("id") for ep in endpoints)
+        api_refs = [ref for ref in resource_refs if ref.get("api_endpoint_id") in endpoint_ids]
         
         # 构建完整信息
         complete_info = {
@@ -552,6 +571,9 @@ def get_template_complete_info(template_id: str):
             cursor.execute("SELECT id, name, version, base_url, status, created_at, updated_at FROM api_documents WHERE template_id = ?", (template_id,))
             api_documents = [dict(row) for row in cursor.fetchall()]
         
+        # 最近调用日志与文档无关，只查询一次
+        recent_calls = gateway.get_recent_calls(limit=5)
+        
         # 获取每个 API 文档的详细信息
         complete_apis = []
         for api_doc in api_documents:
@@ -563,8 +585,7 @@ def get_template_complete_info(template_id: str):
             # 获取认证配置
             auth_configs = gateway.list_auth_configs(api_document_id=api_id)
             
-            # 获取最近调用日志
-            recent_calls = gateway.get_recent_calls(limit=5)
+            # 筛选该文档的最近调用
             api_calls = [call for call in recent_calls if call.get("api_document_id") == api_id]
             
             # 构建单个 API 的完整信息
@@ -2,11 +2,16 @@
 StepFlow Gateway 集成测试
 """
 
+import copy
 import json
 import tempfile
 import os
+import sqlite3
 import sys
+import threading
+import time
 import unittest
+from unittest import mock
 from pathlib import Path
 
 # 添加 src 目录到 Python 路径
@@ -14,6 +19,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
 from stepflow_gateway import StepFlowGateway
 from stepflow_gateway.core.config import GatewayConfig
+from stepflow_gateway.api.parser import OpenApiRefResolver
 
 
 class TestStepFlowGateway(unittest.TestCase):
@@ -405,6 +411,445 @@ class TestStepFlowGateway(unittest.TestCase):
         self.assertTrue(updated_config.debug)
         self.assertEqual(updated_config.logging.level, 'DEBUG')
 
+    
+    def test_11_endpoint_stats_with_null_status_code(self):
+        """测试没有状态码的调用日志不会使端点计数变为 NULL"""
+        openapi_doc = {
+            "openapi": "3.0.0",
+            "info": {"title": "Head API", "version": "1.0.0"},
+            "paths": {"/head": {"head": {"summary": "Head check"}}}
+        }
+        
+        result = self.gateway.register_api("Head API", json.dumps(openapi_doc))
+        endpoint_id = result['endpoints'][0]['id']
+        
+        request = {'method': 'HEAD', 'url': 'https://api.test.com/head',
+                   'headers': {}, 'body': None, 'params': {}}
+        # 第一次调用没有状态码，之后是一次成功和一次失败的调用
+        self.gateway.api_manager.log_api_call(endpoint_id, request, {'success': False}, 5)
+        self.gateway.api_manager.log_api_call(endpoint_id, request, {'status_code': 200}, 10)
+        self.gateway.api_manager.log_api_call(endpoint_id, request, {'status_code': 500}, 15)
+        
+        endpoint_stats = self.gateway.get_endpoint_statistics(endpoint_id)
+        self.assertEqual(endpoint_stats['call_count'], 3)
+        self.assertEqual(endpoint_stats['success_count'], 1)
+        self.assertEqual(endpoint_stats['error_count'], 1)
+        self.assertEqual(endpoint_stats['avg_response_time_ms'], 10)
+
+    
+    def test_12_template_content_on_demand(self):
+        """测试模板列表不返回内容，内容按需读取"""
+        openapi_doc = {
+            "openapi": "3.0.0",
+            "info": {"title": "Template API", "version": "1.0.0"},
+            "paths": {"/tpl": {"get": {"summary": "Get template"}}}
+        }
+        openapi_content = json.dumps(openapi_doc)
+        
+        result = self.gateway.register_api("Template API", openapi_content)
+        template_id = result['template_id']
+        db_manager = self.gateway.db_manager
+        
+        # 列表只包含元数据
+        templates = db_manager.list_templates()
+        template = next(t for t in templates if t['id'] == template_id)
+        self.assertEqual(template['name'], 'Template API')
+        self.assertNotIn('content', template)
+        
+        # 内容按需读取，与注册时的原文一致
+        self.assertEqual(db_manager.get_template_content(template_id), openapi_content)
+        self.assertEqual(db_manager.get_template(template_id)['content'], openapi_content)
+        self.assertIsNone(db_manager.get_template_content("non-existent-id"))
+
+    
+    def test_13_template_partial_update(self):
+        """测试模板部分更新只写入传入的字段，值未变化时不写入"""
+        db_manager = self.gateway.db_manager
+        template_id = db_manager.create_template("Original", '{"v": 1}')
+        
+        # 只更新名称，内容保持不变
+        self.assertTrue(db_manager.update_template(template_id, name="Renamed"))
+        template = db_manager.get_template(template_id)
+        self.assertEqual(template['name'], 'Renamed')
+        self.assertEqual(template['content'], '{"v": 1}')
+        
+        # 只更新内容，名称保持不变
+        self.assertTrue(db_manager.update_template(template_id, content='{"v": 2}'))
+        template = db_manager.get_template(template_id)
+        self.assertEqual(template['name'], 'Renamed')
+        self.assertEqual(template['content'], '{"v": 2}')
+        
+        # 值未变化时不写入，updated_at 保持不变
+        updated_at = template['updated_at']
+        self.assertFalse(db_manager.update_template(template_id, name="Renamed", content='{"v": 2}'))
+        self.assertEqual(db_manager.get_template(template_id)['updated_at'], updated_at)
+        
+        # 任一字段变化即写入
+        self.assertTrue(db_manager.update_template(template_id, name="Renamed", content='{"v": 3}'))
+        template = db_manager.get_template(template_id)
+        self.assertEqual(template['name'], 'Renamed')
+        self.assertEqual(template['content'], '{"v": 3}')
+        
+        # 没有传入任何字段
+        self.assertFalse(db_manager.update_template(template_id))
+
+    
+    def _register_routes(self, name, paths):
+        """注册只包含给定路径的 API，返回 (文档 ID, {(path, method): 端点 ID})"""
+        openapi_doc = {
+            "openapi": "3.0.0",
+            "info": {"title": name, "version": "1.0.0"},
+            "paths": {path: {method: {"summary": f"{method} {path}"} for method in methods}
+                      for path, methods in paths.items()}
+        }
+        result = self.gateway.register_api(name, json.dumps(openapi_doc))
+        self.assertTrue(result['success'])
+        return result['document_id'], {(ep['path'], ep['method']): ep['id'] for ep in result['endpoints']}
+    
+    def test_14_call_api_by_path_routing(self):
+        """测试按路径调用时的路由匹配与路由缓存失效"""
+        api_manager = self.gateway.api_manager
+        document_id, ids = self._register_routes("Pet API", {
+            "/pets": ["get", "post"],
+            "/pets/{petId}": ["get", "delete"],
+            "/pets/mine": ["get"],
+            "/pets/{petId}/toys/{toyId}": ["get"]
+        })
+        
+        def route(path, method='GET', api_document_id=None):
+            result = api_manager.call_api_by_path(path, method, {}, api_document_id)
+            return result.get('endpoint_id')
+        
+        # 只验证路由，不发出真实请求
+        with mock.patch.object(api_manager, 'call_api',
+                               side_effect=lambda endpoint_id, request_data: {'success': True, 'endpoint_id': endpoint_id}):
+            # 路径参数匹配实际值，多个参数逐段匹配
+            self.assertEqual(route('/pets/42'), ids[('/pets/{petId}', 'GET')])
+            self.assertEqual(route('/pets/42', 'delete'), ids[('/pets/{petId}', 'DELETE')])
+            self.assertEqual(route('/pets/1/toys/2'), ids[('/pets/{petId}/toys/{toyId}', 'GET')])
+            self.assertEqual(route('/pets', 'POST'), ids[('/pets', 'POST')])
+            
+            # 字面路径优先于路径参数
+            self.assertEqual(route('/pets/mine'), ids[('/pets/mine', 'GET')])
+            self.assertEqual(route('/pets/mine', 'DELETE'), ids[('/pets/{petId}', 'DELETE')])
+            
+            # 直接传入占位符路径
+            self.assertEqual(route('/pets/{petId}'), ids[('/pets/{petId}', 'GET')])
+            
+            # 参数不能为空或跨段，尾部斜杠、多余的段和未定义的方法都不匹配
+            self.assertIsNone(route('/pets/'))
+            self.assertIsNone(route('/pets//toys/2'))
+            self.assertIsNone(route('/pets/1/toys'))
+            self.assertIsNone(route('/pets/1/extra'))
+            self.assertIsNone(route('/pets', 'DELETE'))
+            
+            result = api_manager.call_api_by_path('/unknown', 'GET', {})
+            self.assertFalse(result['success'])
+            self.assertIn('Endpoint not found', result['error'])
+            
+            # 路由缓存建立后注册的新 API 也能匹配，并可按文档过滤
+            store_id, store_ids = self._register_routes("Store API", {"/store/orders/{orderId}": ["get"]})
+            self.assertEqual(route('/store/orders/9'), store_ids[('/store/orders/{orderId}', 'GET')])
+            self.assertEqual(route('/store/orders/9', api_document_id=store_id),
+                             store_ids[('/store/orders/{orderId}', 'GET')])
+            self.assertIsNone(route('/store/orders/9', api_document_id=document_id))
+            self.assertEqual(route('/pets/42', api_document_id=document_id), ids[('/pets/{petId}', 'GET')])
+            
+            # 删除 API 后其路由不再匹配，其他 API 的路由不受影响
+            self.assertTrue(self.gateway.delete_api(store_id))
+            self.assertIsNone(route('/store/orders/9'))
+            self.assertIsNone(route('/store/orders/9', api_document_id=store_id))
+            self.assertEqual(route('/pets/42'), ids[('/pets/{petId}', 'GET')])
+    
+    def test_15_buffered_call_logs(self):
+        """测试缓冲的调用日志在刷新和关闭时写入，请求体、响应体序列化后可还原"""
+        openapi_doc = {
+            "openapi": "3.0.0",
+            "info": {"title": "Log API", "version": "1.0.0"},
+            "paths": {"/logs": {"post": {"summary": "Create log"}}}
+        }
+        
+        result = self.gateway.register_api("Log API", json.dumps(openapi_doc))
+        endpoint_id = result['endpoints'][0]['id']
+        api_manager = self.gateway.api_manager
+        
+        def log_call(body, params, response):
+            request = {'method': 'POST', 'url': 'https://api.test.com/logs',
+                       'headers': {'Content-Type': 'application/json'}, 'body': body, 'params': params}
+            api_manager.log_api_call(endpoint_id, request, response, 7)
+        
+        # 少于一批的日志先留在缓冲区，查询前刷新写入
+        log_call({'name': '测试', 'tags': ['a', 'b'], 'nested': {'n': 1}}, {'page': 2},
+                 {'status_code': 201, 'headers': {'X-Id': '1'}, 'body': [{'id': 1}, {'id': 2}]})
+        log_call(None, {}, {'status_code': 204, 'headers': {}, 'body': {}})
+        log_call([1, 2, 3], {}, {'status_code': 400, 'headers': {}, 'body': {'error': 'bad'}})
+        
+        stats = self.gateway.get_statistics()
+        self.assertEqual(stats['api_calls'], 3)
+        
+        recent_calls = self.gateway.get_recent_calls(10)
+        self.assertEqual(len(recent_calls), 3)
+        by_status = {call['response_status_code']: call for call in recent_calls}
+        
+        created = by_status[201]
+        self.assertEqual(json.loads(created['request_body']), {'name': '测试', 'tags': ['a', 'b'], 'nested': {'n': 1}})
+        self.assertEqual(json.loads(created['request_params']), {'page': 2})
+        self.assertEqual(json.loads(created['request_headers']), {'Content-Type': 'application/json'})
+        self.assertEqual(json.loads(created['response_headers']), {'X-Id': '1'})
+        self.assertEqual(json.loads(created['response_body']), [{'id': 1}, {'id': 2}])
+        
+        self.assertIsNone(by_status[204]['request_body'])
+        self.assertEqual(json.loads(by_status[204]['request_params']), {})
+        self.assertEqual(json.loads(by_status[204]['response_body']), {})
+        self.assertEqual(json.loads(by_status[400]['request_body']), [1, 2, 3])
+        self.assertEqual(json.loads(by_status[400]['response_body']), {'error': 'bad'})
+        
+        endpoint_stats = self.gateway.get_endpoint_statistics(endpoint_id)
+        self.assertEqual(endpoint_stats['call_count'], 3)
+        self.assertEqual(endpoint_stats['success_count'], 2)
+        self.assertEqual(endpoint_stats['error_count'], 1)
+        
+        # 关闭时写完尚未刷新的日志
+        log_call({'late': True}, {}, {'status_code': 200, 'headers': {}, 'body': {}})
+        log_call({'late': True}, {}, {'status_code': 200, 'headers': {}, 'body': {}})
+        self.gateway.close()
+        
+        connection = sqlite3.connect(self.temp_db.name)
+        try:
+            count = connection.execute('SELECT COUNT(*) FROM api_call_logs').fetchone()[0]
+            late_bodies = connection.execute(
+                'SELECT request_body FROM api_call_logs WHERE response_status_code = 200'
+            ).fetchall()
+        finally:
+            connection.close()
+        self.assertEqual(count, 5)
+        self.assertEqual([json.loads(row[0]) for row in late_bodies], [{'late': True}, {'late': True}])
+
+    
+    def test_16_call_logs_with_memory_database(self):
+        """测试内存数据库不启动后台写入线程，调用日志和认证日志通过同一连接写入"""
+        config = GatewayConfig()
+        config.database.path = ':memory:'
+        gateway = StepFlowGateway(config)
+        self.assertTrue(gateway.initialize())
+        try:
+            openapi_doc = {
+                "openapi": "3.0.0",
+                "info": {"title": "Memory API", "version": "1.0.0"},
+                "paths": {"/items": {"get": {"summary": "List items"}}}
+            }
+            result = gateway.register_api("Memory API", json.dumps(openapi_doc))
+            endpoint_id = result['endpoints'][0]['id']
+            
+            request = {'method': 'GET', 'url': 'https://api.test.com/items',
+                       'headers': {}, 'body': None, 'params': {'page': 1}}
+            for _ in range(config.database.call_log_batch_size + 3):
+                gateway.api_manager.log_api_call(endpoint_id, request, {'status_code': 200, 'body': [1]}, 3)
+            gateway.auth_manager.log_auth_attempt('cfg', 'bearer', 'success', 'static', 1)
+            
+            self.assertEqual(gateway.get_statistics()['api_calls'], config.database.call_log_batch_size + 3)
+            self.assertEqual(gateway.get_endpoint_statistics(endpoint_id)['success_count'],
+                             config.database.call_log_batch_size + 3)
+            self.assertIsNone(gateway.db_manager._log_writer)
+            
+            gateway.db_manager.flush_auth_logs()
+            with gateway.db_manager.get_cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM auth_logs')
+                self.assertEqual(cursor.fetchone()[0], 1)
+        finally:
+            gateway.close()
+
+    
+    def test_17_log_writer_failures(self):
+        """测试日志写入线程的容错：坏行只丢弃自身、线程退出后重启、关闭时等待有上限"""
+        openapi_doc = {
+            "openapi": "3.0.0",
+            "info": {"title": "Writer API", "version": "1.0.0"},
+            "paths": {"/items": {"post": {"summary": "Create item"}}}
+        }
+        result = self.gateway.register_api("Writer API", json.dumps(openapi_doc))
+        endpoint_id = result['endpoints'][0]['id']
+        db_manager = self.gateway.db_manager
+        
+        def log_call(body):
+            request = {'method': 'POST', 'url': 'https://api.test.com/items',
+                       'headers': {}, 'body': body, 'params': {}}
+            self.gateway.api_manager.log_api_call(endpoint_id, request, {'status_code': 201}, 2)
+        
+        # 无法序列化的请求体只让这一行被丢弃，同批的其他日志仍然写入
+        with self.assertLogs('stepflow_gateway.database.manager', 'ERROR'):
+            log_call({'n': 1})
+            log_call({'bad': object()})
+            log_call({'n': 2})
+            db_manager.flush_api_call_logs()
+        self.assertEqual(self.gateway.get_statistics()['api_calls'], 2)
+        self.assertEqual(self.gateway.get_endpoint_statistics(endpoint_id)['call_count'], 2)
+        
+        # 写入线程退出后（如 fork 出的子进程中），下次入队时重新启动，而不是阻塞在队列上
+        dead_writer = db_manager._log_writer
+        db_manager._log_queue.put(None)
+        dead_writer.join()
+        with self.assertLogs('stepflow_gateway.database.manager', 'WARNING'):
+            log_call({'n': 3})
+            db_manager.flush_api_call_logs()
+        self.assertIsNot(db_manager._log_writer, dead_writer)
+        self.assertTrue(db_manager._log_writer.is_alive())
+        self.assertEqual(self.gateway.get_statistics()['api_calls'], 3)
+        
+        # 写入线程卡住时 close 最多等待 timeout 秒，并报告未写入的日志条数
+        release = threading.Event()
+        db_manager.config.timeout = 0.2
+        try:
+            with mock.patch.object(db_manager, '_write_log_rows', side_effect=lambda *args: release.wait(5)):
+                for _ in range(db_manager.config.call_log_batch_size * 2):
+                    log_call({'n': 4})
+                with self.assertLogs('stepflow_gateway.database.manager', 'ERROR') as logs:
+                    db_manager.close()
+        finally:
+            release.set()
+        self.assertIn('未写入', logs.output[-1])
+
+    
+    def test_18_api_caches_expire_after_ttl(self):
+        """测试绕过 ApiManager 直接写库后，端点模板、路由和上游认证缓存在 cache_ttl 秒后失效"""
+        openapi_doc = {
+            "openapi": "3.0.0",
+            "info": {"title": "TTL API", "version": "1.0.0"},
+            "paths": {"/items": {"get": {"summary": "List items"}}}
+        }
+        result = self.gateway.register_api("TTL API", json.dumps(openapi_doc), base_url="https://old.example.com")
+        document_id = result['document_id']
+        endpoint_id = result['endpoints'][0]['id']
+        api_manager = self.gateway.api_manager
+        db_manager = self.gateway.db_manager
+        
+        with mock.patch.object(api_manager, 'execute_api_call', return_value={'success': True, 'status_code': 200}) as execute:
+            def sent_request():
+                self.assertTrue(api_manager.call_api_by_path('/items', 'GET', {}, api_document_id=document_id)['success'])
+                return execute.call_args[0][0]
+            
+            self.assertEqual(sent_request()['url'], 'https://old.example.com/items')
+            
+            # 模拟其他 worker 进程的修改：直接写库，本进程缓存不会被通知
+            with db_manager.get_cursor() as cursor:
+                cursor.execute('UPDATE api_documents SET base_url = ? WHERE id = ?', ('https://new.example.com', document_id))
+            db_manager.create_auth_config(document_id, 'bearer', {'token': 'fresh'})
+            
+            request = sent_request()
+            self.assertEqual(request['url'], 'https://old.example.com/items')
+            self.assertNotIn('Authorization', request['headers'])
+            
+            expired = time.monotonic() + self.config.cache_ttl + 1
+            with mock.patch('time.monotonic', return_value=expired):
+                request = sent_request()
+            self.assertEqual(request['url'], 'https://new.example.com/items')
+            self.assertEqual(request['headers']['Authorization'], 'Bearer fresh')
+    
+    def test_19_api_caches_disabled(self):
+        """测试关闭缓存时每次调用都读取最新的端点配置"""
+        self.config.cache_enabled = False
+        gateway = StepFlowGateway(self.config)
+        try:
+            openapi_doc = {
+                "openapi": "3.0.0",
+                "info": {"title": "Uncached API", "version": "1.0.0"},
+                "paths": {"/items": {"get": {"summary": "List items"}}}
+            }
+            result = gateway.register_api("Uncached API", json.dumps(openapi_doc), base_url="https://old.example.com")
+            endpoint_id = result['endpoints'][0]['id']
+            
+            with mock.patch.object(gateway.api_manager, 'execute_api_call',
+                                   return_value={'success': True, 'status_code': 200}) as execute:
+                gateway.api_manager.call_api(endpoint_id, {})
+                with gateway.db_manager.get_cursor() as cursor:
+                    cursor.execute('UPDATE api_documents SET base_url = ?', ('https://new.example.com',))
+                gateway.api_manager.call_api(endpoint_id, {})
+            
+            self.assertEqual([call[0][0]['url'] for call in execute.call_args_list],
+                             ['https://old.example.com/items', 'https://new.example.com/items'])
+        finally:
+            gateway.close()
+
+    
+    def test_20_unserializable_request_body(self):
+        """测试无法序列化的请求体返回错误结果，不向调用方抛出异常"""
+        api_request = {'method': 'POST', 'url': 'https://api.test.com/items',
+                       'headers': {}, 'body': {'value': object()}, 'params': {}}
+        
+        with self.assertLogs('stepflow_gateway.api.manager', 'ERROR'):
+            result = self.gateway.api_manager.execute_api_call(api_request)
+        
+        self.assertFalse(result['success'])
+        self.assertEqual(result['status_code'], 0)
+        self.assertIn('error', result)
+
+    
+    def test_21_openapi_doc_cache(self):
+        """测试 OpenAPI 内容缓存按模板版本失效，返回的解析结果只读"""
+        openapi_doc = {
+            "openapi": "3.0.0",
+            "info": {"title": "Doc API", "version": "1.0.0"},
+            "tags": [{"name": "items"}],
+            "paths": {"/items": {"get": {"summary": "List items", "parameters": [{"name": "page", "in": "query"}]}}}
+        }
+        result = self.gateway.register_api("Doc API", json.dumps(openapi_doc))
+        document_id = result['document_id']
+        api_manager = self.gateway.api_manager
+        db_manager = self.gateway.db_manager
+        
+        with mock.patch.object(db_manager, 'get_template_content', wraps=db_manager.get_template_content) as get_content:
+            cached_doc = api_manager.get_openapi_doc(document_id)
+            self.assertEqual(json.loads(json.dumps(cached_doc)), openapi_doc)
+            # 模板未变化时不再读取模板全文
+            self.assertIs(api_manager.get_openapi_doc(document_id), cached_doc)
+            self.assertEqual(get_content.call_count, 1)
+            
+            # 模板内容更新后（updated_at 随之变化）重新读取并解析
+            openapi_doc['info']['title'] = "Doc API v2"
+            self.assertTrue(db_manager.update_template(result['template_id'], content=json.dumps(openapi_doc)))
+            self.assertEqual(api_manager.get_openapi_doc(document_id)['info']['title'], "Doc API v2")
+            self.assertEqual(get_content.call_count, 2)
+        
+        # 共享的缓存结果不允许原地修改，复制后得到可修改的普通结构
+        cached_doc = api_manager.get_openapi_doc(document_id)
+        with self.assertRaises(TypeError):
+            cached_doc['info']['title'] = "changed"
+        with self.assertRaises(TypeError):
+            cached_doc['paths'].pop('/items')
+        with self.assertRaises(AttributeError):
+            cached_doc['tags'].append({"name": "other"})
+        
+        doc_copy = copy.deepcopy(cached_doc)
+        doc_copy['info']['title'] = "changed"
+        self.assertEqual(api_manager.get_openapi_doc(document_id)['info']['title'], "Doc API v2")
+        
+        endpoints = self.gateway.list_endpoints(document_id)
+        self.assertEqual(endpoints[0]['parameters'][0]['name'], 'page')
+        self.assertIsNone(api_manager.get_openapi_doc('missing'))
+
+    
+    def test_22_invalid_internal_references(self):
+        """测试无效的内部引用（非整数下标、越界下标、在标量上导航）统一报告为无效引用"""
+        for ref in ('#/x-list/first', '#/x-list/5', '#/info/title/deeper', '#/missing'):
+            openapi_doc = {
+                "openapi": "3.0.0",
+                "info": {"title": "Ref API", "version": "1.0.0"},
+                "x-list": [{"type": "string"}],
+                "paths": {"/items": {"get": {"responses": {"200": {"$ref": ref}}}}}
+            }
+            with self.subTest(ref=ref):
+                with self.assertRaisesRegex(ValueError, "Invalid internal reference '%s'" % ref):
+                    OpenApiRefResolver().resolve_document(json.dumps(openapi_doc))
+        
+        resolver = OpenApiRefResolver()
+        resolved = resolver.resolve_document(json.dumps({
+            "openapi": "3.0.0",
+            "info": {"title": "Ref API", "version": "1.0.0"},
+            "x-list": [{"type": "string"}],
+            "paths": {"/items": {"get": {"responses": {"200": {"$ref": "#/x-list/0"}}}}}
+        }))
+        self.assertEqual(resolved['paths']['/items']['get']['responses']['200'], {"type": "string"})
+
 
 if __name__ == '__main__':
     # 运行测试